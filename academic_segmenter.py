@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Academic Sentence Segmenter
+
+Splits text into sentences and paragraphs without rewriting it. Segmentation returns
+(start, end, paragraph_index) spans into the text it was given, so callers slice
+sentences out only when they need them.
+
+Sentence boundaries come from NLTK's Punkt model with academic abbreviations added
+("et al.", "pp.", "e.g.", "cf.", "vol.", ...), so a citation such as
+"(Smith et al., 2020, pp. 4-5)" is never split in the middle. The model is built
+once and persisted with pickle.
+"""
+
+import os
+import re
+import copy
+import pickle
+import bisect
+from nltk.tokenize.punkt import PunktParameters, PunktSentenceTokenizer
+
+# Abbreviations that never end a sentence in academic prose, in Punkt's form:
+# lowercase, without the final period
+ACADEMIC_ABBREVIATIONS = [
+    'al',                           # et al.
+    'p', 'pp',                      # page, pages
+    'e.g', 'i.e', 'cf', 'viz', 'vs',
+    'vol', 'vols', 'ed', 'eds', 'trans', 'ch', 'sec',
+    'fig', 'figs', 'eq', 'eqs',
+    'ibid', 'op', 'cit', 'ca', 'approx'
+]
+
+# Bumped whenever the way the model is built changes, so persisted copies are rebuilt
+SEGMENTER_VERSION = 1
+
+# A blank line (possibly holding spaces or tabs) separates paragraphs
+PARAGRAPH_SEPARATOR = re.compile(r'\n[ \t\r\f\v]*\n\s*')
+
+
+def _pretrained_parameters():
+    """Punkt parameters trained on English text, or None if the NLTK data is not installed."""
+    try:
+        # NLTK 3.8.2+ ships the model as punkt_tab
+        from nltk.tokenize.punkt import PunktTokenizer
+        return PunktTokenizer('english')._params
+    except (ImportError, LookupError, OSError, ValueError):
+        pass
+    try:
+        import nltk
+        return nltk.data.load('tokenizers/punkt/english.pickle')._params
+    except (LookupError, OSError, ValueError):
+        return None
+
+
+class AcademicSegmenter:
+    """
+    Punkt sentence segmenter tuned for academic writing.
+    """
+
+    def __init__(self, model_path=None, abbreviations=None):
+        self.model_path = model_path
+        self.abbreviations = sorted(set(abbreviations or ACADEMIC_ABBREVIATIONS))
+        self.pretrained = False
+        self.tokenizer = PunktSentenceTokenizer(self.load_parameters())
+
+    def load_parameters(self):
+        """
+        Load the persisted Punkt parameters, building and saving them if needed.
+
+        Returns:
+            PunktParameters: Parameters with the academic abbreviations added
+        """
+        if self.model_path and os.path.exists(self.model_path):
+            try:
+                with open(self.model_path, 'rb') as f:
+                    saved = pickle.load(f)
+                # A copy built without the pretrained English model is rebuilt, in case the NLTK data
+                # has been installed since
+                if (saved.get('version') == SEGMENTER_VERSION and saved.get('pretrained')
+                        and saved.get('abbreviations') == self.abbreviations):
+                    self.pretrained = True
+                    return saved['params']
+            except Exception as e:
+                print(f"✗ Could not load sentence segmenter from {self.model_path}: {e}")
+
+        params = _pretrained_parameters()
+        self.pretrained = params is not None
+        if params is None:
+            print("✗ NLTK punkt data not found, segmenting with academic abbreviations only")
+            print("  Install it with: python -m nltk.downloader punkt_tab")
+            params = PunktParameters()
+        else:
+            # NLTK may cache the loaded model, so never modify it in place
+            params = copy.deepcopy(params)
+        params.abbrev_types.update(self.abbreviations)
+
+        if self.model_path:
+            try:
+                directory = os.path.dirname(self.model_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(self.model_path, 'wb') as f:
+                    pickle.dump({
+                        'version': SEGMENTER_VERSION,
+                        'pretrained': self.pretrained,
+                        'abbreviations': self.abbreviations,
+                        'params': params
+                    }, f)
+            except OSError as e:
+                print(f"✗ Could not save sentence segmenter to {self.model_path}: {e}")
+
+        return params
+
+    def segment(self, text):
+        """
+        Split text into sentence spans.
+
+        Paragraphs are separated by blank lines, and a sentence never crosses one.
+
+        Args:
+            text (str): The text to segment
+
+        Returns:
+            list: (start, end, paragraph_index) tuples in text order; text[start:end] is the sentence
+        """
+        separators = [(match.start(), match.end()) for match in PARAGRAPH_SEPARATOR.finditer(text)]
+        separator_starts = [start for start, _ in separators]
+
+        spans = []
+        for start, end in self.tokenizer.span_tokenize(text):
+            # Cut the sentence at any paragraph break Punkt did not treat as a boundary
+            # (e.g. a heading with no final punctuation)
+            paragraph_index = bisect.bisect_right(separator_starts, start)
+            while paragraph_index < len(separators) and separators[paragraph_index][0] < end:
+                separator_start, separator_end = separators[paragraph_index]
+                piece_end = separator_start
+                while piece_end > start and text[piece_end - 1].isspace():
+                    piece_end -= 1
+                if piece_end > start:
+                    spans.append((start, piece_end, paragraph_index))
+                start = separator_end
+                paragraph_index += 1
+            if end > start:
+                spans.append((start, end, paragraph_index))
+        return spans
+
+    def sentences(self, text):
+        """Split text into sentence strings."""
+        return [text[start:end] for start, end, _ in self.segment(text)]
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Server-side Analysis Store
+
+Keeps finished analyses (the analysis JSON, the analyzed text and the file name) on
+the server so that the session only has to carry an analysis id. Entries are stored
+compressed in a local SQLite file shared by every worker on the machine, keyed by a
+hash of their content, so storing the same analysis twice keeps one copy. Entries
+expire when they have not been used for ttl_seconds, and the least recently used
+ones are dropped when the store grows beyond max_bytes.
+"""
+
+import os
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+
+
+class AnalysisStore:
+    """
+    Content-addressed SQLite store for analyses with a TTL and a size cap.
+    """
+
+    def __init__(self, path, ttl_seconds=86400, max_bytes=500 * 1024 * 1024):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+
+        self._local = threading.local()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._open()
+
+    def _connection(self):
+        """Get the SQLite connection for the current process and thread."""
+        # Connections must not cross a fork, so they are keyed by pid as well as thread
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _open(self):
+        """Create the table if needed."""
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS analyses ('
+                'id TEXT PRIMARY KEY, '
+                'data BLOB NOT NULL, '
+                'size INTEGER NOT NULL, '
+                'created_at REAL NOT NULL, '
+                'accessed_at REAL NOT NULL)'
+            )
+            connection.execute('CREATE INDEX IF NOT EXISTS analyses_by_access ON analyses (accessed_at)')
+
+    def put(self, analysis, text, filename):
+        """
+        Store an analysis.
+
+        Args:
+            analysis (dict): The analysis result, as returned by /analyze
+            text (str): The analyzed text
+            filename (str): Name of the analyzed file
+
+        Returns:
+            str: The analysis id (a hash of the content)
+        """
+        encoded = json.dumps({'analysis': analysis, 'text': text, 'filename': filename}, sort_keys=True).encode('utf-8')
+        analysis_id = hashlib.sha256(encoded).hexdigest()
+        data = zlib.compress(encoded, 6)
+
+        now = time.time()
+        connection = self._connection()
+        with connection:
+            # Storing the same content again only refreshes it
+            connection.execute(
+                'INSERT INTO analyses (id, data, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT (id) DO UPDATE SET accessed_at = excluded.accessed_at',
+                (analysis_id, data, len(data), now, now)
+            )
+        self._prune()
+        return analysis_id
+
+    def get(self, analysis_id):
+        """
+        Load an analysis by id.
+
+        Args:
+            analysis_id (str): The id returned by put()
+
+        Returns:
+            dict: {'analysis', 'text', 'filename'}, or None if it is unknown or has expired
+        """
+        if not analysis_id:
+            return None
+        now = time.time()
+        connection = self._connection()
+        row = connection.execute(
+            'SELECT data FROM analyses WHERE id = ? AND accessed_at >= ?', (analysis_id, now - self.ttl_seconds)
+        ).fetchone()
+        if row is None:
+            return None
+        with connection:
+            connection.execute('UPDATE analyses SET accessed_at = ? WHERE id = ?', (now, analysis_id))
+        return json.loads(zlib.decompress(row[0]).decode('utf-8'))
+
+    def _prune(self):
+        """Drop expired entries, then the least recently used ones beyond max_bytes."""
+        connection = self._connection()
+        with connection:
+            connection.execute('DELETE FROM analyses WHERE accessed_at < ?', (time.time() - self.ttl_seconds,))
+            if self.max_bytes:
+                # Keep the most recently used entries whose running total fits in max_bytes
+                connection.execute(
+                    'DELETE FROM analyses WHERE id IN ('
+                    'SELECT id FROM (SELECT id, SUM(size) OVER (ORDER BY accessed_at DESC, id) AS total FROM analyses) '
+                    'WHERE total > ?)',
+                    (self.max_bytes,)
+                )
+
+    def get_stats(self):
+        """Get the number of stored analyses and their total compressed size."""
+        count, total = self._connection().execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM analyses').fetchone()
+        return {
+            'analyses': count,
+            'bytes': total,
+            'max_bytes': self.max_bytes,
+            'ttl_seconds': self.ttl_seconds
+        }
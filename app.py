@@ -1,125 +1,242 @@
-from flask import Flask, render_template, request, jsonify, after_this_request, send_from_directory, send_file, session, make_response
+from flask import Flask, render_template, request, jsonify, after_this_request, send_from_directory, send_file, session, make_response, Response, stream_with_context
 import pandas as pd
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
 import nltk
 import re
 import os
+import bisect
+import shutil
 import tempfile
 import PyPDF2
 from docx import Document
 import io
+import queue
+import threading
 from werkzeug.utils import secure_filename
-from scibert_rhetorical_classifier import RhetoricalMoveClassifier
+from scibert_rhetorical_classifier import RhetoricalMoveClassifier, move_from_probabilities, FAST_TIER_FILE
+from result_cache import ResultCache
+from single_flight import SingleFlight, FlightAbandoned
+from inference_batcher import MicroBatcher
+from academic_segmenter import AcademicSegmenter, SEGMENTER_VERSION
+from text_normalizer import normalize_text, WORKS_CITED
+from job_queue import JobQueue, new_job_id, QUEUED, RUNNING, DONE, CANCELLED
+from analysis_store import AnalysisStore
+from citation_engine import identify_citations, scan_document, AuthorMatcher, find_author_names
 import pdfkit
 import uuid
 import json
+import hashlib
 from datetime import datetime
 
 app = Flask(__name__, static_url_path='/static', static_folder='static')
 app.secret_key = 'citation_analysis_secret_key'
 
+# Directory of the fine-tuned SciBERT model
+SCIBERT_MODEL_PATH = os.environ.get('SCIBERT_MODEL_PATH', 'bert_comparison_results/scibert/final_model/')
+
+# Sentence prediction cache shared by all workers on this machine (set to an empty string to keep it in memory only)
+PREDICTION_CACHE_PATH = os.environ.get('PREDICTION_CACHE_PATH', os.path.join('cache', 'sentence_predictions.sqlite3'))
+
+# Inference backend for SciBERT: "torch" or "onnx" (ONNX Runtime on CPU, requires onnxruntime)
+SCIBERT_BACKEND = os.environ.get('SCIBERT_BACKEND', 'torch')
+
+# Numeric precision for SciBERT: "fp32", "int8" (dynamic quantization, CPU) or "bf16" (where supported)
+SCIBERT_PRECISION = os.environ.get('SCIBERT_PRECISION', 'fp32')
+
+# Cascade mode: sentences the fast TF-IDF tier scores at or above this confidence skip SciBERT (unset to disable)
+CASCADE_THRESHOLD = os.environ.get('CASCADE_THRESHOLD', '')
+
+# Citation scanning: "document" runs each citation pattern once over the whole text,
+# "sentence" runs them sentence by sentence after segmentation
+CITATION_SCAN_MODE = os.environ.get('CITATION_SCAN_MODE', 'document')
+
+# Long documents are analyzed in windows of whole paragraphs of about this many characters
+ANALYSIS_WINDOW_CHARS = int(os.environ.get('ANALYSIS_WINDOW_CHARS', '200000'))
+
+# Streamed analyses start with a window of about this many characters and double it for each
+# later window (up to ANALYSIS_WINDOW_CHARS), so the first sentences come back quickly. The
+# window sizes only affect segmentation and classification batches: author names come from
+# the whole document, so the stream carries the same analysis as the JSON response
+STREAM_FIRST_WINDOW_CHARS = int(os.environ.get('STREAM_FIRST_WINDOW_CHARS', '2000'))
+
+# How much of an uploaded stream is read at a time
+STREAM_READ_CHARS = 65536
+
+# Background analysis jobs: SQLite queue shared by all workers on this machine, the number of
+# job threads per process, and where uploaded files wait until their job extracts them
+JOB_QUEUE_PATH = os.environ.get('JOB_QUEUE_PATH', os.path.join('cache', 'jobs.sqlite3'))
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '2'))
+JOB_UPLOAD_DIR = os.environ.get('JOB_UPLOAD_DIR', os.path.join('cache', 'job_uploads'))
+
+# Results of background jobs are kept until they are fetched; set this to delete results
+# that nobody fetches within that many days
+JOB_UNFETCHED_RESULT_DAYS = os.environ.get('JOB_UNFETCHED_RESULT_DAYS', '')
+
+# Whole-document results cache: SQLite file shared by all workers (empty string for memory only),
+# how many documents each worker keeps in memory, and how many are kept on disk
+DOCUMENT_CACHE_PATH = os.environ.get('DOCUMENT_CACHE_PATH', os.path.join('cache', 'document_results.sqlite3'))
+DOCUMENT_CACHE_MEMORY_ITEMS = int(os.environ.get('DOCUMENT_CACHE_MEMORY_ITEMS', '32'))
+DOCUMENT_CACHE_DISK_ITEMS = int(os.environ.get('DOCUMENT_CACHE_DISK_ITEMS', '2000'))
+
+# Bump whenever citation detection, segmentation or the move rules change, so cached
+# document results from the old rules are not served
+ANALYSIS_RULES_VERSION = 1
+
+# Analyses kept on the server for the report downloads (the session only holds their id):
+# dropped after ANALYSIS_STORE_TTL_HOURS without use, or when the store exceeds ANALYSIS_STORE_MAX_MB
+ANALYSIS_STORE_PATH = os.environ.get('ANALYSIS_STORE_PATH', os.path.join('cache', 'analyses.sqlite3'))
+ANALYSIS_STORE_TTL_HOURS = float(os.environ.get('ANALYSIS_STORE_TTL_HOURS', '24'))
+ANALYSIS_STORE_MAX_MB = float(os.environ.get('ANALYSIS_STORE_MAX_MB', '500'))
+
+# Sentence segmenter model (Punkt with academic abbreviations), built on first start and reused
+SEGMENTER_MODEL_PATH = os.environ.get('SEGMENTER_MODEL_PATH', os.path.join('cache', 'academic_punkt.pickle'))
+
 # Initialize the rhetorical move classifier
-rhetorical_classifier = RhetoricalMoveClassifier()
+rhetorical_classifier = RhetoricalMoveClassifier(
+    SCIBERT_MODEL_PATH,
+    cache_path=PREDICTION_CACHE_PATH or None,
+    backend=SCIBERT_BACKEND,
+    precision=SCIBERT_PRECISION,
+    cascade_threshold=float(CASCADE_THRESHOLD) if CASCADE_THRESHOLD else None
+)
+
+# Sentences from concurrent requests are gathered into shared forward passes, flushed when
+# INFERENCE_MAX_BATCH sentences are waiting or the oldest has waited INFERENCE_MAX_WAIT_MS
+rhetorical_batcher = MicroBatcher(
+    rhetorical_classifier,
+    max_batch_size=int(os.environ.get('INFERENCE_MAX_BATCH', '64')),
+    max_wait_ms=float(os.environ.get('INFERENCE_MAX_WAIT_MS', '10'))
+)
+
+# Sentence segmenter shared by analysis and highlighting
+academic_segmenter = AcademicSegmenter(SEGMENTER_MODEL_PATH)
+
+def analysis_pipeline_identity():
+    """Fingerprint everything that determines a document's analysis, to namespace the document cache"""
+    parts = [
+        rhetorical_classifier.model_identity() if rhetorical_classifier.is_ready() else 'fallback',
+        f"cascade={CASCADE_THRESHOLD}",
+        f"rules={ANALYSIS_RULES_VERSION}",
+        f"scan={CITATION_SCAN_MODE}",
+        f"segmenter={SEGMENTER_VERSION}"
+    ]
+    # The fast tier is left out of the model identity, but decides moves in cascade mode
+    fast_tier_path = os.path.join(SCIBERT_MODEL_PATH, FAST_TIER_FILE)
+    if CASCADE_THRESHOLD and os.path.exists(fast_tier_path):
+        parts.append(f"fast_tier={os.stat(fast_tier_path).st_mtime_ns}")
+    return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
 
-def preprocess_text(text, author_names=None):
+# Whole-document results, so resubmitting a document skips the analysis
+document_cache = ResultCache(
+    path=DOCUMENT_CACHE_PATH or None,
+    namespace=analysis_pipeline_identity(),
+    max_memory_items=DOCUMENT_CACHE_MEMORY_ITEMS,
+    max_disk_items=DOCUMENT_CACHE_DISK_ITEMS,
+    table='document_results'
+)
+
+# Identical analyses requested at the same time (e.g. a class trying the sample text)
+# share one computation
+analysis_flight = SingleFlight()
+
+# Finished analyses for the report downloads
+analysis_store = AnalysisStore(
+    ANALYSIS_STORE_PATH,
+    ttl_seconds=ANALYSIS_STORE_TTL_HOURS * 3600,
+    max_bytes=int(ANALYSIS_STORE_MAX_MB * 1024 * 1024)
+)
+
+# Background analysis jobs (see run_analysis_job); worker threads start on first use in each process
+job_queue = JobQueue(
+    JOB_QUEUE_PATH,
+    lambda payload, progress: run_analysis_job(payload, progress),
+    worker_count=JOB_WORKERS,
+    unfetched_retention_seconds=float(JOB_UNFETCHED_RESULT_DAYS) * 86400 if JOB_UNFETCHED_RESULT_DAYS else None,
+    # Uploaded files of a job are normally removed when it runs; this catches any left over
+    on_purge=lambda job_id: shutil.rmtree(os.path.join(JOB_UPLOAD_DIR, job_id), ignore_errors=True)
+)
+
+def preprocess_text(text, author_names=None, scan_mode=None, offset=0):
+    # offset is where text starts in the whole document; reported offsets are shifted by it
+    # Use the configured citation scanning mode unless one is given
+    if scan_mode is None:
+        scan_mode = CITATION_SCAN_MODE
+    # Clean up the extracted text in one pass: broken page ranges, whitespace (keeping
+    # paragraph breaks), the works cited section, hyphenated line breaks and "( 2020 )".
+    # The result maps back to the uploaded text, so reported offsets point into it
+    normalized = normalize_text(text)
+    document_text = normalized.text
+    
+    # Split the text into (start, end, paragraph_index) sentence spans; academic
+    # abbreviations such as "et al." and "pp." never end a sentence
+    segments = academic_segmenter.segment(document_text)
+    sentence_spans = [(start, end) for start, end, _ in segments]
+    sentence_starts = [start for start, _ in sentence_spans]
+    
+    # In document mode every citation pattern runs once over the whole text, and the
+    # author names come out of the same scan unless the caller already has them
+    document_citations = None
+    if scan_mode == 'document':
+        document_citations, document_author_names = scan_document(document_text, sentence_spans)
+        if author_names is None:
+            author_names = document_author_names
+        else:
+            # Names already known (e.g. from earlier parts of the document) are kept and extended
+            author_names.update(document_author_names)
+    
     # Initialize author_names if not provided
     if author_names is None:
         author_names = set()
-    # First fix citations that might be broken across lines
-    # Look for patterns like "(Wilson, 2019, pp. " followed by "78-92)" on the next line
-    text = re.sub(r'\(([\w]+),\s+(\d{4}),\s+pp\.\s*\n\s*(\d+)-(\d+)\)', r'(\1, \2, pp. \3-\4)', text)
-    
-    # Also fix citations where just the page range is broken across lines
-    text = re.sub(r'\(([\w]+),\s+(\d{4}),\s+pp\.\s*\n\s*(\d+.*?)\)', r'(\1, \2, pp. \3)', text)
-    
-    # Store paragraph breaks for later restoration
-    paragraphs = text.split('\n\n')
-    processed_paragraphs = []
     
-    for paragraph in paragraphs:
-        # Normalize whitespace within paragraphs
-        paragraph = re.sub(r'\s+', ' ', paragraph)
-        paragraph = paragraph.replace('\n', ' ').replace('\r', ' ')
-        processed_paragraphs.append(paragraph.strip())
-    
-    # Rejoin with paragraph markers
-    text = '\n\n'.join(processed_paragraphs)
-    
-    # Remove works cited section if present (common in essays)
-    works_cited_patterns = [r'Works Cited.*$', r'References.*$', r'Bibliography.*$']
-    for pattern in works_cited_patterns:
-        text = re.sub(pattern, '', text, flags=re.IGNORECASE | re.DOTALL)
-    
-    # Fix common formatting issues from PDFs
-    # Fix hyphenated words that might be split across lines
-    text = re.sub(r'(\w+)- (\w+)', r'\1\2', text)
-    
-    # Fix citation formatting issues
-    # Fix spaces in citations like "Smith ( 2020 )" to "Smith (2020)"
-    text = re.sub(r'\( (\d{4}) \)', r'(\1)', text)
-    
-    # Temporarily replace "et al." to prevent sentence splitting
-    text = text.replace("et al.", "et_al_PLACEHOLDER")
-    
-    # Split text into sentences, preserving paragraph breaks
-    all_sentences = []
-    for paragraph in text.split('\n\n'):
-        sentences = nltk.sent_tokenize(paragraph)
-        # Restore "et al." in each sentence
-        sentences = [s.replace("et_al_PLACEHOLDER", "et al.") for s in sentences]
-        # Add paragraph marker at the end of each paragraph's sentences
-        if sentences:
-            sentences[-1] = sentences[-1] + "[PARAGRAPH_BREAK]"
-        all_sentences.extend(sentences)
-    
-    # Use the paragraph-aware sentences
-    sentences = all_sentences
+    # Find possessive and narrative author references (e.g., "Johnson's approach")
+    # in one pass over the document, then hand each mention to its sentence
+    author_mentions = [[] for _ in segments]
+    for start, end, author in AuthorMatcher(author_names).find_mentions(document_text):
+        index = bisect.bisect_right(sentence_starts, start) - 1
+        if index >= 0 and end <= sentence_spans[index][1]:
+            author_mentions[index].append((start - sentence_starts[index], author))
     
     # Analyze each sentence for citations
     analyzed_sentences = []
     all_citations = []
     total_citation_count = 0
     
-    for sentence in sentences:
+    for index, (sentence_start, sentence_end, paragraph_index) in enumerate(segments):
+        sentence = document_text[sentence_start:sentence_end]
+        mentions = author_mentions[index]
+        
+        # The last sentence of each paragraph carries the paragraph break
+        has_paragraph_break = index + 1 == len(segments) or segments[index + 1][2] != paragraph_index
+        
         # Check for possessive author references (e.g., "Johnson's approach")
-        has_author_reference = False
-        for author in author_names:
-            possessive_pattern = f"\\b{author}'s\\b"
-            narrative_pattern = f"\\b{author}\\s+(?:argues|claims|states|suggests|notes|observes|finds|proposes|demonstrates|shows)\\b"
-            
-            if re.search(possessive_pattern, sentence, re.IGNORECASE) or re.search(narrative_pattern, sentence, re.IGNORECASE):
-                has_author_reference = True
-                break
+        has_author_reference = bool(mentions)
         # Get citations from this sentence
-        citations, citation_count = identify_citations(sentence, author_names)
+        if document_citations is not None:
+            citations, citation_count = document_citations[index]
+        else:
+            citations, citation_count = identify_citations(sentence, author_names, offset=sentence_start)
         
         # If no formal citations but we found an author reference, add an implicit citation
         if citation_count == 0 and has_author_reference:
-            for author in author_names:
-                possessive_pattern = f"\\b{author}'s\\b"
-                narrative_pattern = f"\\b{author}\\s+(?:argues|claims|states|suggests|notes|observes|finds|proposes|demonstrates|shows)\\b"
-                
-                if re.search(possessive_pattern, sentence, re.IGNORECASE):
-                    # Just use the author name for possessive references
-                    citations.append({
-                        'text': author,
-                        'style': 'Narrative APA',
-                        'is_narrative': True
-                    })
-                    citation_count = 1
-                    break
-                elif re.search(narrative_pattern, sentence, re.IGNORECASE):
-                    # Just use the author name for narrative references
-                    citations.append({
-                        'text': author,
-                        'style': 'Narrative APA',
-                        'is_narrative': True
-                    })
-                    citation_count = 1
-                    break
+            # Just use the author name of the earliest possessive or narrative reference
+            start, author = mentions[0]
+            citations.append({
+                'text': author,
+                'style': 'Narrative APA',
+                'is_narrative': True,
+                'start': start,
+                'end': start + len(author),
+                'doc_start': sentence_start + start,
+                'doc_end': sentence_start + start + len(author)
+            })
+            citation_count = 1
         has_citation = citation_count > 0
         
+        # Report document offsets against the text as uploaded
+        for citation in citations:
+            doc_start, doc_end = normalized.span_to_original(citation['doc_start'], citation['doc_end'])
+            citation['doc_start'], citation['doc_end'] = offset + doc_start, offset + doc_end
+        
         # Determine the citation style for the sentence
         citation_style = 'None'
         if has_citation:
@@ -147,476 +264,40 @@ def preprocess_text(text, author_names=None):
         # Extract just the citation text for display
         citation_texts = [citation['text'] for citation in citations]
         
-        # Check if this sentence has a paragraph break marker
-        has_paragraph_break = False
-        if sentence.endswith("[PARAGRAPH_BREAK]"):
-            sentence = sentence.replace("[PARAGRAPH_BREAK]", "")
-            has_paragraph_break = True
-            
-        analyzed_sentences.append({
+        original_start, original_end = normalized.span_to_original(sentence_start, sentence_end)
+        sentence_info = {
             'sentence': sentence,
+            'start': offset + original_start,
+            'end': offset + original_end,
             'has_citation': has_citation,
             'citations': citation_texts,
             'citation_count': citation_count,
             'citation_style': citation_style,
             'paragraph_break': has_paragraph_break
-        })
+        }
+        if has_citation:
+            # Keep each citation's style and offsets so the UI can highlight without re-scanning
+            sentence_info['citations_with_styles'] = [{
+                'text': citation['text'],
+                'style': citation['style'],
+                'start': citation['start'],
+                'end': citation['end'],
+                'doc_start': citation['doc_start'],
+                'doc_end': citation['doc_end']
+            } for citation in citations]
+        analyzed_sentences.append(sentence_info)
         
         all_citations.extend(citations)
         total_citation_count += citation_count
         
     return analyzed_sentences, all_citations, total_citation_count
 
-def identify_citations(s, author_names=None):
-    # Initialize author_names if not provided
-    if author_names is None:
-        author_names = set()
-    # Initialize the citations list with dictionaries containing text and style
-    citations = []
-    
-    # Track years in APA citations to avoid duplication
-    apa_years = set()
-    
-    # Track rhetorical move type for implicit citations
-    rhetorical_move_type = None
-    
-    # REPORTING MOVE PATTERNS (directly reporting what sources say)
-    reporting_patterns = [
-        r'\b(?:according to|as stated by|as reported by|as noted by|as observed by)\b',
-        r'\b(?:they|he|she|it)\s+(?:state|report|note|observe|mention|describe|explain|define|clarify)s?\b',
-        r'\b(?:their|his|her|its)\s+(?:statement|report|observation|description|explanation|definition)s?\b',
-        r'\b(?:in the words of|quoted from|directly from)\b',
-        r'\bidentifies\b'
-    ]
-    
-    # TRANSFORMING MOVE PATTERNS (paraphrasing or synthesizing)
-    transforming_patterns = [
-        r'\b(?:their|his|her|its)\s+(?:findings|research|study|analysis|work|paper|article|results|approach|methodology|framework|model|theory|concept|perspective)s?\b',
-        r'\b(?:they|he|she|it)\s+(?:found|discovered|reported|showed|demonstrated|argued|suggested|proposed|developed|established|determined|concluded|identified)\b',
-        r'\b(?:these|those|this|that)\s+(?:findings|results|studies|researchers|authors|scholars|studies|papers|articles|analyses)\b',
-        r'\b(?:according to|as per)\s+(?:them|him|her|it)\b',
-        r'\b(?:similar|similarly|likewise|in the same way|in a similar manner)\b',
-        r'\b(?:building on|extending|drawing from|synthesizing|combining|integrating)\b',
-        r'\bcase\s+(?:study|studies|analysis|analyses)\b'
-    ]
-    
-    # EVALUATING MOVE PATTERNS (critiquing or analyzing sources)
-    evaluating_patterns = [
-        r'\b(?:overlooks|fails to|neglects|ignores|misses|omits|lacks|inadequately|insufficiently)\b',
-        r'\b(?:their|his|her|its)\s+(?:critique|criticism|assessment|evaluation|limitation|weakness|strength|advantage|shortcoming|gap|flaw|merit)s?\b',
-        r'\b(?:they|he|she|it)\s+(?:critiques|criticizes|assesses|evaluates|challenges|questions|contests|disputes|refutes|counters)\b',
-        r'\b(?:however|nevertheless|nonetheless|although|though|despite|in spite of|yet|but|conversely|in contrast|on the contrary|on the other hand)\b',
-        r'\b(?:problematic|questionable|debatable|controversial|unconvincing|unsupported|unsubstantiated|flawed|limited|narrow|biased|misleading)\b',
-        r'\b(?:critically|insightfully|perceptively|astutely|shrewdly)\b',
-        r'\b(?:strength|weakness|merit|limitation|advantage|disadvantage|benefit|drawback|shortcoming|gap|flaw)s?\b'
-    ]
-    
-    # Check for reporting patterns
-    for pattern in reporting_patterns:
-        if re.search(pattern, s, re.IGNORECASE):
-            # For reporting patterns, extract just the author name if possible
-            author_match = re.search(r'According to\s+([\w]+)', s, re.IGNORECASE)
-            if author_match:
-                author = author_match.group(1)
-                citations.append({
-                    'text': author,
-                    'style': 'Narrative APA',
-                    'is_narrative': True
-                })
-            else:
-                # If no clear author, use the pattern match
-                match_text = re.search(pattern, s, re.IGNORECASE).group(0)
-                citations.append({
-                    'text': match_text,
-                    'style': 'Implicit',
-                    'is_demonstrative': True
-                })
-            rhetorical_move_type = 'Reporting'
-            break
-    
-    # If not reporting, check for evaluating patterns
-    if not rhetorical_move_type:
-        for pattern in evaluating_patterns:
-            if re.search(pattern, s, re.IGNORECASE):
-                # For evaluating patterns, just extract the author name if mentioned
-                author_match = re.search(r'([\w]+)[\s\']s\s+(?:approach|framework|model|theory)', s, re.IGNORECASE)
-                if author_match:
-                    author = author_match.group(1)
-                    citations.append({
-                        'text': author,
-                        'style': 'Narrative APA',
-                        'is_narrative': True
-                    })
-                else:
-                    # If no clear author, use a minimal representation
-                    citations.append({
-                        'text': "Implicit Citation",
-                        'style': 'Implicit'
-                    })
-                rhetorical_move_type = 'Evaluating'
-                break
-    
-    # If neither reporting nor evaluating, check for transforming patterns
-    if not rhetorical_move_type:
-        for pattern in transforming_patterns:
-            if re.search(pattern, s, re.IGNORECASE):
-                # For transforming patterns, extract just the author reference if possible
-                author_match = re.search(r'(their|his|her|its)\s+(?:findings|research|study)', s, re.IGNORECASE)
-                if author_match:
-                    citations.append({
-                        'text': "Implicit Citation",
-                        'style': 'Implicit'
-                    })
-                else:
-                    # If no clear reference, use a minimal representation
-                    citations.append({
-                        'text': "Implicit Citation",
-                        'style': 'Implicit'
-                    })
-                rhetorical_move_type = 'Transforming'
-                break
-    
-    # Pre-process the string to fix common formatting issues
-    # Remove extra spaces between author and year
-    s = re.sub(r'(\w+)\s+\((\d{4})\)', r'\1 (\2)', s)
-    
-    # ===== APA CITATION FORMATS =====
-    # 1. Single author: Smith (2020)
-    for match in re.findall(r'([\w]+)\s+\((\d{4})\)', s):
-        citations.append({
-            'text': f"{match[0]} ({match[1]})",
-            'style': 'APA'
-        })
-        apa_years.add(match[1])
-    
-    # 2. Two authors: Smith and Johnson (2020)
-    for match in re.findall(r'([\w]+)\s+and\s+([\w]+)\s+\((\d{4})\)', s):
-        citations.append({
-            'text': f"{match[0]} and {match[1]} ({match[2]})",
-            'style': 'APA'
-        })
-        apa_years.add(match[2])
-    
-    # 3. Multiple authors with et al.: Smith et al. (2020)
-    for match in re.findall(r'([\w]+)\s+et\s+al\.?\s+\((\d{4})\)', s):
-        citations.append({
-            'text': f"{match[0]} et al. ({match[1]})",
-            'style': 'APA'
-        })
-        apa_years.add(match[1])
-    
-    # 4. Three authors: Smith, Johnson, and Lee (2020)
-    for match in re.findall(r'([\w]+),\s+([\w]+),\s+and\s+([\w]+)\s+\((\d{4})\)', s):
-        citations.append({
-            'text': f"{match[0]}, {match[1]}, and {match[2]} ({match[3]})",
-            'style': 'APA'
-        })
-        apa_years.add(match[3])
-    
-    # 4. Four+ authors: Smith et al. (2020)
-    for match in re.findall(r'([\w]+)\s+et\s+al\.\s+\((\d{4})\)', s):
-        citations.append({
-            'text': f"{match[0]} et al. ({match[1]})",
-            'style': 'APA'
-        })
-        apa_years.add(match[1])
-    
-    # 5. Report with year: IPCC report (2022)
-    for match in re.findall(r'([\w\s]+)\s+report\s+\((\d{4})\)', s, re.IGNORECASE):
-        citations.append({
-            'text': f"{match[0]} report ({match[1]})",
-            'style': 'APA'
-        })
-        apa_years.add(match[1])
-        
-    # 6. Multiple authors with page number in parentheses: (Chen et al. 2018, p. 42)
-    for match in re.findall(r'\(([\w]+)\s+et\s+al\.\s+(\d{4}),\s+p\.\s+(\d+)\)', s):
-        citations.append({
-            'text': f"({match[0]} et al. {match[1]}, p. {match[2]})",
-            'style': 'APA'
-        })
-        apa_years.add(match[1])
-        
-    # 7. Two authors with comma before year: (Reynolds and Ahmed, 2021)
-    for match in re.findall(r'\(([\w]+)\s+and\s+([\w]+),\s+(\d{4})\)', s):
-        citations.append({
-            'text': f"({match[0]} and {match[1]}, {match[2]})",
-            'style': 'APA'
-        })
-        apa_years.add(match[2])
-        
-    # 8. Multiple authors with comma before year: (Johnson et al., 2021)
-    for match in re.findall(r'\(([\w]+)\s+et\s+al\.,\s+(\d{4})\)', s):
-        citations.append({
-            'text': f"({match[0]} et al., {match[1]})",
-            'style': 'APA'
-        })
-        apa_years.add(match[1])
-        
-    # 9. Author with page range: (Wilson, 2019, pp. 78-92)
-    for match in re.findall(r'\(([\w]+),\s+(\d{4}),\s+pp\.\s+(\d+)-(\d+)\)', s, re.IGNORECASE):
-        citations.append({
-            'text': f"({match[0]}, {match[1]}, pp. {match[2]}-{match[3]})",
-            'style': 'APA'
-        })
-        apa_years.add(match[1])
-        
-    # 9c. Exact match for Wilson citation
-    if "(Wilson, 2019, pp. 78-92)" in s:
-        # Check if this citation has already been added
-        citation_text = "(Wilson, 2019, pp. 78-92)"
-        if not any(c['text'] == citation_text for c in citations):
-            citations.append({
-                'text': citation_text,
-                'style': 'APA'
-            })
-            apa_years.add('2019')
-        
-    # 9b. Alternative pattern for page range with more flexible spacing
-    for match in re.findall(r'\(\s*([\w]+)\s*,\s*(\d{4})\s*,\s*pp\.\s*(\d+)\s*-\s*(\d+)\s*\)', s, re.IGNORECASE):
-        # Check if this citation has already been added
-        citation_text = f"({match[0]}, {match[1]}, pp. {match[2]}-{match[3]})"
-        if not any(c['text'] == citation_text for c in citations):
-            citations.append({
-                'text': citation_text,
-                'style': 'APA'
-            })
-            apa_years.add(match[1])
-        
-    # 10. Two authors with page number: (Garcia and Martinez, 2022, p. 215)
-    for match in re.findall(r'\(([\w]+)\s+and\s+([\w]+),\s+(\d{4}),\s+p\.\s+(\d+)\)', s):
-        citations.append({
-            'text': f"({match[0]} and {match[1]}, {match[2]}, p. {match[3]})",
-            'style': 'APA'
-        })
-        apa_years.add(match[2])
-    
-    # ===== MLA CITATION FORMATS =====
-    # 1. One author with page number: (Johnson 42)
-    for match in re.findall(r'\(([\w]+)\s+(\d+)\)', s):
-        # Skip if this looks like an author with year that's already in APA citations
-        if len(match[1]) == 4 and 1900 <= int(match[1]) <= 2100 and match[1] in apa_years:
-            continue
-        citations.append({
-            'text': f"{match[0]} {match[1]}",
-            'style': 'MLA'
-        })
-    
-    # 2. Two authors with year: (Thompson and Lee 2018)
-    for match in re.findall(r'\(([\w]+)\s+and\s+([\w]+)\s+(\d{4})\)', s):
-        citations.append({
-            'text': f"{match[0]} and {match[1]} {match[2]}",
-            'style': 'MLA'
-        })
-        # Add to APA years to prevent duplication
-        apa_years.add(match[2])
-    
-    # 3. Two authors without page numbers: (Smith and Johnson)
-    for match in re.findall(r'\(([\w]+)\s+and\s+([\w]+)\)', s):
-        citations.append({
-            'text': f"{match[0]} and {match[1]}",
-            'style': 'MLA'
-        })
-    
-    # 4. Three authors with page numbers: (Chen, Roberts and Williams 78)
-    for match in re.findall(r'\(([\w]+),\s+([\w]+),\s+and\s+([\w]+)\s+(\d+)\)', s):
-        citations.append({
-            'text': f"{match[0]}, {match[1]} and {match[2]} {match[3]}",
-            'style': 'MLA'
-        })
-    
-    # 5. Three authors without page numbers: (Smith, Johnson and Lee)
-    for match in re.findall(r'\(([\w]+),\s+([\w]+),\s+and\s+([\w]+)\)', s):
-        citations.append({
-            'text': f"{match[0]}, {match[1]} and {match[2]}",
-            'style': 'MLA'
-        })
-    
-    # 6. Four+ author citations with page number: (Davis et al. 45)
-    for match in re.findall(r'\(([\w]+)\s+et\s+al\.\s+(\d+)\)', s):
-        citations.append({
-            'text': f"{match[0]} et al. {match[1]}",
-            'style': 'MLA'
-        })
-    
-    # 7. Four+ author citations without page numbers: (Smith et al.)
-    for match in re.findall(r'\(([\w]+)\s+et al\.\)', s):
-        citations.append({
-            'text': f"{match[0]} et al.",
-            'style': 'MLA'
-        })
-    
-    # 8. Citations with quoted material: ("Climate Report")
-    for match in re.findall(r'\(\"(.*?)"\)', s):
-        citations.append({
-            'text': f'"{match}"',
-            'style': 'MLA'
-        })
-    
-    # 9. Single author without page number: (Smith)
-    for match in re.findall(r'\(([\w]+)\)', s):
-        # Skip if it's a year that's already in APA citations
-        if match.isdigit() and len(match) == 4 and 1900 <= int(match) <= 2100 and match in apa_years:
-            continue
-        
-        # Skip if this author is already part of another citation
-        author_already_cited = False
-        for citation in citations:
-            if match == citation['text'].split()[0]:  # Check if it's the first word
-                author_already_cited = True
-                break
-        
-        if not author_already_cited:
-            citations.append({
-                'text': match,
-                'style': 'MLA'
-            })
-    
-    # 10. Narrative citations: As noted by Roberts
-    for match in re.findall(r'(?:noted|mentioned|stated|cited|according to|as per)\s+by\s+([\w]+)', s, re.IGNORECASE):
-        # Skip if this author is already part of another citation
-        author_already_cited = False
-        for citation in citations:
-            if match == citation['text'].split()[0]:  # Check if it's the first word
-                author_already_cited = True
-                break
-        
-        if not author_already_cited:
-            citations.append({
-                'text': match,
-                'style': 'Unsure'
-            })
-    
-    # 11. Page number only citations: (42)
-    for match in re.findall(r'\((\d+)\)', s):
-        # Skip if it's a year that's already in APA citations
-        if len(match) == 4 and 1900 <= int(match) <= 2100 and match in apa_years:
-            continue
-        
-        # Check if this page number is already part of another citation
-        page_already_cited = False
-        for citation in citations:
-            if f" {match}" in citation['text'] or match == citation['text']:
-                page_already_cited = True
-                break
-        
-        if not page_already_cited:
-            citations.append({
-                'text': f'p.{match}',
-                'style': 'MLA'
-            })
-    
-    # 12. Detect citations with year at the end of sentence like "...cognitive processes (Mislevy, 2018)."
-    for match in re.findall(r'\((\w+),?\s+(\d{4})\)', s):
-        author = match[0].rstrip(',').strip()
-        year = match[1].strip()
-        
-        # Skip if this citation is already detected
-        already_cited = False
-        for citation in citations:
-            if f"{author}" in citation['text'] and year in citation['text']:
-                already_cited = True
-                break
-        
-        if not already_cited:
-            citations.append({
-                'text': f"{author} ({year})",
-                'style': 'APA'
-            })
-            apa_years.add(year)
-    
-    # 13. Detect in-text citations like "According to Abrams" or "Baptista and Gradim explore"
-    # First look for common author-signal phrases
-    author_signals = [
-        r'(?:According to|as stated by|as noted by|as mentioned by|as argued by|as claimed by|as shown by|as demonstrated by|as explained by)\s+([A-Z][\w]+)',
-        r'([A-Z][\w]+)\s+(?:states|argues|claims|notes|mentions|shows|demonstrates|explains|explores|examines|investigates|analyzes|discusses|suggests|proposes|concludes)',
-        r'([A-Z][\w]+)\s+and\s+([A-Z][\w]+)\s+(?:state|argue|claim|note|mention|show|demonstrate|explain|explore|examine|investigate|analyze|discuss|suggest|propose|conclude)'
-    ]
-    
-    for pattern in author_signals:
-        for match in re.findall(pattern, s):
-            if isinstance(match, tuple):
-                # Handle multiple authors
-                for author in match:
-                    # Skip if this author is already part of another citation
-                    author_already_cited = False
-                    for citation in citations:
-                        if author in citation['text']:
-                            author_already_cited = True
-                            break
-                    
-                    if not author_already_cited and len(author) > 1:  # Ensure it's a real name
-                        citations.append({
-                            'text': author,
-                            'style': 'Narrative'
-                        })
-            else:
-                # Single author
-                author = match
-                # Skip if this author is already part of another citation
-                author_already_cited = False
-                for citation in citations:
-                    if author in citation['text']:
-                        author_already_cited = True
-                        break
-                
-                if not author_already_cited and len(author) > 1:  # Ensure it's a real name
-                    citations.append({
-                        'text': author,
-                        'style': 'Narrative'
-                    })
-    
-    # Better duplicate detection - check for partial matches
-    unique_citations = []
-    unique_citation_texts = []
-    
-    for i, citation in enumerate(citations):
-        # Check if this citation is a subset of any other citation
-        is_duplicate = False
-        
-        for j, other_citation in enumerate(citations):
-            if i == j:  # Skip comparing with itself
-                continue
-                
-            # Check if this citation is contained within another citation
-            other_text = other_citation['text']
-            if citation['text'] != other_text and citation['text'] in other_text:
-                is_duplicate = True
-                break
-                
-        if not is_duplicate and citation['text'] not in unique_citation_texts:
-            unique_citations.append(citation)
-            unique_citation_texts.append(citation['text'])
-    
-    # Sort citations by their position in the text for better presentation
-    text_positions = []
-    for citation in unique_citations:
-        citation_text = citation['text']
-        # Find position in the original text
-        pos = s.find(citation_text.split('(')[0] if '(' in citation_text else citation_text)
-        if pos == -1:  # If exact match not found, try a more flexible approach
-            for part in citation_text.split():
-                if len(part) > 3:  # Only consider substantial parts
-                    pos = s.find(part)
-                    if pos != -1:
-                        break
-        text_positions.append((pos if pos != -1 else float('inf'), citation))
-    
-    # Sort by position and extract just the citations
-    sorted_unique_citations = [item[1] for item in sorted(text_positions, key=lambda x: x[0])]
-    citation_count = len(sorted_unique_citations)
-    
-    return sorted_unique_citations, citation_count
-
-def analyze_rhetorical_moves(sentence_info):
+def apply_rule_shortcuts(sentence_info):
     """
-    Use machine learning models to classify the rhetorical move of a sentence.
+    Apply the cheap pattern-based checks that decide a rhetorical move without the ML model.
     
-    The three categories are:
-    - Reporting: Directly reporting what a source says
-    - Transforming: Paraphrasing or synthesizing source material
-    - Evaluating: Critiquing, analyzing, or evaluating sources
-    - No Citation: Sentences without citations
+    Returns a (rhetorical_move, confidence) tuple when a rule settles the sentence,
+    or None when the sentence still needs the classifier.
     """
     sentence = sentence_info['sentence']
     has_citation = sentence_info['has_citation']
@@ -650,13 +331,20 @@ def analyze_rhetorical_moves(sentence_info):
     if 'citations' in sentence_info and len(sentence_info['citations']) > 1:
         return "Transforming", 0.9
     
-    # FIRST: Use the ML classifier to predict the rhetorical move for sentences with citations
-    rhetorical_move, confidence = rhetorical_classifier.predict_rhetorical_move(sentence)
+    return None
+
+def resolve_model_prediction(sentence_info, probabilities):
+    """
+    Combine the ML classifier's probability vector for a sentence with the pattern
+    checks that are applied after the model has run.
+    """
+    sentence = sentence_info['sentence']
+    rhetorical_move, confidence = move_from_probabilities(probabilities)
     
     # If the classifier predicts "None" but we have citations, force it to choose among the 3 rhetorical moves
     if rhetorical_move == "None" and sentence_info.get('has_citation', False):
-        # Get the probabilities for the 3 rhetorical moves (excluding None)
-        rhetorical_move, confidence = rhetorical_classifier.predict_rhetorical_move_no_none(sentence)
+        # Renormalize the same probabilities over the 3 rhetorical moves (excluding None)
+        rhetorical_move, confidence = move_from_probabilities(probabilities, exclude_none=True)
     
     # Check for very clear reporting patterns regardless of ML confidence
     reporting_patterns = [
@@ -732,6 +420,53 @@ def analyze_rhetorical_moves(sentence_info):
     
     return rhetorical_move, confidence
 
+def analyze_rhetorical_moves(sentence_info):
+    """
+    Use machine learning models to classify the rhetorical move of a sentence.
+    
+    The three categories are:
+    - Reporting: Directly reporting what a source says
+    - Transforming: Paraphrasing or synthesizing source material
+    - Evaluating: Critiquing, analyzing, or evaluating sources
+    - No Citation: Sentences without citations
+    """
+    shortcut = apply_rule_shortcuts(sentence_info)
+    if shortcut is not None:
+        return shortcut
+    
+    # Use the ML classifier to predict the rhetorical move for sentences with citations
+    probabilities = rhetorical_batcher.predict_probabilities([sentence_info['sentence']])[0]
+    return resolve_model_prediction(sentence_info, probabilities)
+
+def analyze_rhetorical_moves_batch(sentence_infos):
+    """
+    Classify the rhetorical moves of a whole document at once.
+    
+    The rule shortcuts are applied to every sentence first; the sentences that still
+    need the ML classifier are then sent through a single batched call instead of
+    one forward pass per sentence.
+    
+    Returns a list of (rhetorical_move, confidence) tuples in input order.
+    """
+    results = [None] * len(sentence_infos)
+    pending = []
+    
+    # Phase 1: cheap rule shortcuts
+    for i, sentence_info in enumerate(sentence_infos):
+        shortcut = apply_rule_shortcuts(sentence_info)
+        if shortcut is not None:
+            results[i] = shortcut
+        else:
+            pending.append(i)
+    
+    # Phase 2: one batched classifier call for everything the rules could not decide
+    if pending:
+        probabilities = rhetorical_batcher.predict_probabilities([sentence_infos[i]['sentence'] for i in pending])
+        for i, sentence_probabilities in zip(pending, probabilities):
+            results[i] = resolve_model_prediction(sentence_infos[i], sentence_probabilities)
+    
+    return results
+
 @app.route('/')
 def home():
     @after_this_request
@@ -753,6 +488,17 @@ def new_interface():
         return response
     return render_template('index_new.html')
 
+@app.route('/model_info', methods=['GET'])
+def model_info():
+    """Report the classifier configuration, cache and batching counters, and this worker's memory usage"""
+    info = rhetorical_classifier.get_model_info()
+    info['batching'] = rhetorical_batcher.get_stats()
+    info['jobs'] = job_queue.get_stats()
+    info['analysis_store'] = analysis_store.get_stats()
+    info['document_cache'] = document_cache.get_stats()
+    info['single_flight'] = analysis_flight.get_stats()
+    return jsonify(info)
+
 @app.route('/analyze', methods=['POST'])
 def analyze():
     print('Received request:', request.json)
@@ -765,8 +511,146 @@ def analyze():
             'citation_count': 0
         })
     
+    # Opt-in streaming: ?stream=ndjson or ?stream=sse (or the matching Accept header)
+    stream_format = request.args.get('stream', '')
+    if not stream_format:
+        accept = request.headers.get('Accept', '')
+        if 'application/x-ndjson' in accept:
+            stream_format = 'ndjson'
+        elif 'text/event-stream' in accept:
+            stream_format = 'sse'
+    if stream_format in ('ndjson', 'sse'):
+        return stream_analysis(text, stream_format)
+    
     return process_text(text)
 
+def stream_analysis(text, stream_format):
+    """
+    Stream an analysis as one frame per sentence, followed by a final stats frame.
+    
+    Every frame is a JSON object: {"type": "sentence", "index": i, "sentence": {...}} as
+    each sentence is finished, then {"type": "stats", "sentence_count": n,
+    "citation_count": ..., "rhetorical_move_stats": {...}}, or {"type": "error", "error": ...}
+    if the analysis fails part way. NDJSON sends one frame per line; SSE sends each
+    frame as the data of an event named after its type.
+    """
+    def encode(frame):
+        data = json.dumps(frame)
+        if stream_format == 'sse':
+            return f"event: {frame['type']}\ndata: {data}\n\n"
+        return data + '\n'
+    
+    def replay(result):
+        # Send a finished analysis as frames all at once
+        for index, sentence_info in enumerate(result['sentence_analysis']):
+            yield encode({'type': 'sentence', 'index': index, 'sentence': sentence_info})
+        yield encode({
+            'type': 'stats',
+            'sentence_count': len(result['sentence_analysis']),
+            'citation_count': result['citation_count'],
+            'rhetorical_move_stats': result['rhetorical_move_stats']
+        })
+    
+    def generate():
+        # A cached document is replayed straight away
+        cache_key = document_cache_key(text)
+        cached = document_cache.get(cache_key)
+        if cached is not None:
+            yield from replay(cached)
+            return
+        
+        # If the same text is already being analyzed, wait for it and replay its result
+        while True:
+            flight, leader = analysis_flight.join(cache_key)
+            if leader:
+                break
+            try:
+                result = flight.wait()
+            except FlightAbandoned:
+                continue
+            except Exception as e:
+                print(f"✗ Streaming analysis failed: {e}")
+                yield encode({'type': 'error', 'error': str(e)})
+                return
+            yield from replay(result)
+            return
+        
+        # The leader's analysis runs in its own thread and hands frames over through a queue,
+        # so a client that reads slowly, or stops reading, does not hold up the waiting requests
+        frames = queue.Queue()
+        
+        def analyze():
+            stats = AnalysisStats()
+            sentence_analysis = []
+            try:
+                sentences = iter_analysis(text, stats, first_window_chars=STREAM_FIRST_WINDOW_CHARS)
+                for index, sentence_info in enumerate(sentences):
+                    sentence_analysis.append(sentence_info)
+                    frames.put({'type': 'sentence', 'index': index, 'sentence': sentence_info})
+            except Exception as e:
+                print(f"✗ Streaming analysis failed: {e}")
+                analysis_flight.fail(cache_key, flight, e)
+                frames.put({'type': 'error', 'error': str(e)})
+                return
+            summary = stats.summary()
+            
+            # Only a complete analysis is cached; it is also handed to any waiting requests.
+            # It is the same analysis the JSON route computes (author names always come from
+            # the whole document), so both routes share the cache entry and its ETag
+            result = {'sentence_analysis': sentence_analysis}
+            result.update(summary)
+            document_cache.put(cache_key, result)
+            analysis_flight.finish(cache_key, flight, result)
+            
+            frame = {'type': 'stats', 'sentence_count': stats.sentence_count}
+            frame.update(summary)
+            frames.put(frame)
+        
+        # If the client disconnects, the thread still finishes the analysis for the cache and the waiters
+        threading.Thread(target=analyze, name='stream-analysis', daemon=True).start()
+        while True:
+            frame = frames.get()
+            yield encode(frame)
+            if frame['type'] != 'sentence':
+                return
+    
+    mimetype = 'text/event-stream' if stream_format == 'sse' else 'application/x-ndjson'
+    response = Response(stream_with_context(generate()), mimetype=mimetype)
+    # Ask proxies not to buffer the stream
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/reanalyze', methods=['POST'])
+def reanalyze():
+    """Re-analyze an edited draft, reusing the unchanged sentences of an earlier analysis"""
+    data = request.json or {}
+    text = data.get('text', '')
+    if not text:
+        return jsonify({'error': 'No text provided'}), 400
+    
+    # The earlier analysis comes from the store (an upload or a previous /reanalyze);
+    # without one the draft is simply analyzed in full
+    previous = analysis_store.get(data.get('analysis_id') or session.get('analysis_id'))
+    if previous is None:
+        analysis = analyze_text(text)
+        reused = 0
+        filename = 'pasted_text.txt'
+    else:
+        analysis, reused = reanalyze_text(previous['text'], previous['analysis'], text)
+        filename = previous['filename']
+    
+    # Store the new version so the next edit can be diffed against it
+    analysis_id = analysis_store.put(analysis, text, filename)
+    session['analysis_id'] = analysis_id
+    
+    return jsonify(dict(
+        analysis,
+        analysis_id=analysis_id,
+        reused_sentences=reused,
+        reanalyzed_sentences=len(analysis['sentence_analysis']) - reused
+    ))
+
 
 @app.route('/upload_file', methods=['POST'])
 def upload_file():
@@ -820,6 +704,10 @@ def upload_and_analyze():
     if file.filename == '':
         return jsonify({'error': 'No file selected'})
     
+    # With ?async=1 the file is extracted and analyzed by a background job instead
+    if request.args.get('async'):
+        return submit_upload_job([file], store_analysis=True)
+    
     # Create a temporary file to store the uploaded file
     with tempfile.NamedTemporaryFile(delete=False) as temp:
         file.save(temp.name)
@@ -832,26 +720,30 @@ def upload_and_analyze():
         return jsonify({'error': 'Could not extract text from the file'})
     
     # Process the text and get analysis results
-    analysis_result = process_text(text)
+    analysis_data = analyze_text(text)
     
-    # Store the analysis result in a session variable for download later
-    analysis_data = json.loads(analysis_result.get_data(as_text=True))
-    session['last_analysis'] = analysis_data
-    session['analyzed_text'] = text
-    session['analyzed_filename'] = filename
+    # Keep the analysis on the server for download later; the session only holds its id
+    analysis_id = analysis_store.put(analysis_data, text, filename)
+    session['analysis_id'] = analysis_id
     
-    return analysis_result
+    return jsonify(dict(analysis_data, analysis_id=analysis_id))
+
+def load_stored_analysis():
+    """Load the analysis named by the analysis_id query parameter, or the session's last one"""
+    analysis_id = request.args.get('analysis_id') or session.get('analysis_id')
+    return analysis_store.get(analysis_id)
 
 
 @app.route('/download_analysis_html', methods=['GET'])
 def download_analysis_html():
     """Download the analysis results as an HTML file"""
-    if 'last_analysis' not in session or 'analyzed_filename' not in session:
+    stored = load_stored_analysis()
+    if stored is None:
         return jsonify({'error': 'No analysis results available for download'})
     
-    analysis_data = session['last_analysis']
-    filename = session['analyzed_filename']
-    analyzed_text = session['analyzed_text']
+    analysis_data = stored['analysis']
+    filename = stored['filename']
+    analyzed_text = stored['text']
     
     # Generate a formatted HTML document with the analysis results
     html_content = generate_analysis_html(analysis_data, analyzed_text, filename)
@@ -867,19 +759,19 @@ def download_analysis_html():
 @app.route('/download_analysis_pdf', methods=['GET'])
 def download_analysis_pdf():
     """Download the analysis results as a PDF file"""
-    if 'last_analysis' not in session or 'analyzed_filename' not in session:
+    stored = load_stored_analysis()
+    if stored is None:
         return jsonify({'error': 'No analysis results available for download'})
     
-    analysis_data = session['last_analysis']
-    filename = session['analyzed_filename']
-    analyzed_text = session['analyzed_text']
+    analysis_data = stored['analysis']
+    filename = stored['filename']
+    analyzed_text = stored['text']
     
     # Generate a formatted HTML document with the analysis results
     html_content = generate_analysis_html(analysis_data, analyzed_text, filename)
     
     try:
         # Check if wkhtmltopdf is installed
-        import shutil
         wkhtmltopdf_installed = shutil.which('wkhtmltopdf') is not None
         
         if wkhtmltopdf_installed:
@@ -933,6 +825,10 @@ def analyze_files():
             'citation_count': 0
         })
     
+    # With ?async=1 the files are extracted and analyzed by a background job instead
+    if request.args.get('async'):
+        return submit_upload_job(files)
+    
     # Process each file and combine the text
     combined_text = ""
     for file in files:
@@ -954,6 +850,118 @@ def analyze_files():
     
     return process_text(combined_text)
 
+def submit_upload_job(files, store_analysis=False):
+    """Save uploaded files for a background job and queue it"""
+    job_id = new_job_id()
+    upload_dir = os.path.join(JOB_UPLOAD_DIR, job_id)
+    os.makedirs(upload_dir, exist_ok=True)
+    
+    saved_files = []
+    for index, file in enumerate(files):
+        filename = secure_filename(file.filename)
+        # Prefix with the position so files with the same name do not overwrite each other
+        file_path = os.path.join(upload_dir, f"{index}_{filename}")
+        file.save(file_path)
+        saved_files.append([file_path, filename])
+    
+    job_queue.submit({'files': saved_files, 'store_analysis': store_analysis}, job_id=job_id)
+    return job_accepted(job_id)
+
+def job_accepted(job_id):
+    """Respond to a job submission with 202 Accepted and where to follow it"""
+    response = jsonify({
+        'job_id': job_id,
+        'status': QUEUED,
+        'status_url': f'/jobs/{job_id}',
+        'result_url': f'/jobs/{job_id}/result'
+    })
+    response.status_code = 202
+    response.headers['Location'] = f'/jobs/{job_id}'
+    return response
+
+def run_analysis_job(payload, progress):
+    """Analyze the text or uploaded files of a background job and return its result"""
+    if 'files' in payload:
+        # Extract the uploaded files here, off the request path, then remove them
+        try:
+            text = "\n\n".join(extract_text_from_file(file_path, filename) for file_path, filename in payload['files'])
+        finally:
+            if payload['files']:
+                shutil.rmtree(os.path.dirname(payload['files'][0][0]), ignore_errors=True)
+        if not text.strip():
+            raise ValueError('Could not extract text from the provided files')
+    else:
+        text = payload['text']
+    
+    cache_key = document_cache_key(text)
+    analysis = document_cache.get(cache_key)
+    if analysis is None:
+        stats = AnalysisStats()
+        sentence_analysis = []
+        for sentence_info in iter_analysis(text, stats):
+            sentence_analysis.append(sentence_info)
+            # Progress is reported as sentences done and the share of the text covered so far
+            progress(len(sentence_analysis), round(sentence_info['end'] / len(text), 3))
+        
+        analysis = {'sentence_analysis': sentence_analysis}
+        analysis.update(stats.summary())
+        document_cache.put(cache_key, analysis)
+    else:
+        progress(len(analysis['sentence_analysis']), 1.0)
+    
+    result = {'analysis': analysis}
+    # Uploaded documents are kept for the report downloads
+    if payload.get('store_analysis'):
+        result['analysis_id'] = analysis_store.put(analysis, text, payload['files'][0][1])
+    return result
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """Queue the analysis of a text as a background job"""
+    text = (request.json or {}).get('text', '')
+    if not text:
+        return jsonify({'error': 'No text provided'}), 400
+    return job_accepted(job_queue.submit({'text': text}))
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Report a background job's state and progress"""
+    status = job_queue.status(job_id)
+    if status is None:
+        return jsonify({'error': 'No such job'}), 404
+    return jsonify(status)
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    """Return a finished job's analysis, or its state if it is not done"""
+    status, result = job_queue.result(job_id)
+    if status is None:
+        return jsonify({'error': 'No such job'}), 404
+    if status['status'] in (QUEUED, RUNNING):
+        return jsonify(status), 202
+    if status['status'] == CANCELLED:
+        return jsonify(status), 410
+    if status['status'] != DONE:
+        return jsonify(status), 500
+    
+    # Uploaded documents can be downloaded as a report afterwards
+    if 'analysis_id' in result:
+        session['analysis_id'] = result['analysis_id']
+        return jsonify(dict(result['analysis'], analysis_id=result['analysis_id']))
+    
+    return jsonify(result['analysis'])
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel a queued or running background job"""
+    if job_queue.status(job_id) is None:
+        return jsonify({'error': 'No such job'}), 404
+    cancelled = job_queue.cancel(job_id)
+    # Files of a job that never started are not needed any more
+    if cancelled:
+        shutil.rmtree(os.path.join(JOB_UPLOAD_DIR, job_id), ignore_errors=True)
+    return jsonify({'job_id': job_id, 'cancelled': cancelled, 'status': job_queue.status(job_id)['status']})
+
 @app.route('/display_citations', methods=['POST'])
 def display_citations():
     """Display uploaded text with citation tags highlighted"""
@@ -990,7 +998,7 @@ def display_citations():
             continue
             
         # Process each sentence in the paragraph
-        sentences = nltk.sent_tokenize(paragraph)
+        sentences = academic_segmenter.sentences(paragraph)
         processed_sentences = []
         
         for sentence in sentences:
@@ -999,16 +1007,21 @@ def display_citations():
             
             # If we found citations, mark them in the text
             if citations:
-                marked_sentence = sentence
+                # Build the marked sentence in one pass over the citation spans (already sorted by position)
+                pieces = []
+                cursor = 0
                 for citation in citations:
-                    citation_text = citation['text']
                     citation_style = citation['style']
                     
-                    # Only mark the citation if it's actually in the text (not implicit)
-                    if citation_style != 'Implicit' and citation_text in sentence:
-                        # Create a span with appropriate styling
-                        span = f'<span class="citation {citation_style.lower().replace(" ", "-")}" title="{citation_style}">{citation_text}</span>'
-                        marked_sentence = marked_sentence.replace(citation_text, span)
+                    # Only mark the citation if it's actually in the text (not implicit), and never inside another mark
+                    if citation_style == 'Implicit' or citation['start'] < cursor:
+                        continue
+                    # Create a span with appropriate styling
+                    pieces.append(sentence[cursor:citation['start']])
+                    pieces.append(f'<span class="citation {citation_style.lower().replace(" ", "-")}" title="{citation_style}">{sentence[citation["start"]:citation["end"]]}</span>')
+                    cursor = citation['end']
+                pieces.append(sentence[cursor:])
+                marked_sentence = ''.join(pieces)
                 
                 processed_sentences.append(marked_sentence)
                 all_citations.extend(citations)
@@ -1035,8 +1048,8 @@ def display_citations():
                            citation_counts=citation_counts,
                            filename=filename)
 
-def extract_text_from_file(file_path, filename):
-    """Extract text from different file types"""
+def extract_text_from_file(file_path, filename, raise_errors=False):
+    """Extract text from different file types (errors are returned as the text unless raise_errors is set)"""
     text = ""
     file_ext = os.path.splitext(filename)[1].lower()
     
@@ -1051,10 +1064,12 @@ def extract_text_from_file(file_path, filename):
                     page = pdf_reader.pages[page_num]
                     text += page.extract_text() + "\n"
         elif file_ext in ['.doc', '.docx']:
-            doc = docx.Document(file_path)
+            doc = Document(file_path)
             for para in doc.paragraphs:
                 text += para.text + "\n"
     except Exception as e:
+        if raise_errors:
+            raise
         print(f"Error extracting text from {filename}: {str(e)}")
         text = f"Error processing {filename}: {str(e)}"
     
@@ -1062,30 +1077,9 @@ def extract_text_from_file(file_path, filename):
 
 def extract_author_names(text):
     """Extract all author names from citations in the text for later reference"""
-    author_names = set()
-    
-    # Extract author names from APA citations: (Smith, 2020)
-    for match in re.findall(r'\(([\w]+),\s*\d{4}', text):
-        author_names.add(match)
-    
-    # Extract author names from APA citations with multiple authors: (Smith et al., 2020)
-    for match in re.findall(r'\(([\w]+)\s+et\s+al\.', text):
-        author_names.add(match)
-    
-    # Extract author names from APA citations with two authors: (Smith and Jones, 2020)
-    for match in re.findall(r'\(([\w]+)\s+and\s+([\w]+)', text):
-        author_names.add(match[0])
-        author_names.add(match[1])
-    
-    # Extract author names from narrative citations: Smith (2020)
-    for match in re.findall(r'([\w]+)\s+\(\d{4}\)', text):
-        author_names.add(match)
-    
-    # Extract author names from MLA citations
-    for match in re.findall(r'\(([\w]+)\s+\d+\)', text):
-        author_names.add(match)
-    
-    return author_names
+    # APA (Smith, 2020), et al., two-author, narrative Smith (2020) and MLA (Smith 42) citations,
+    # found in one pass with a combined scanner
+    return find_author_names(text)
 
 def generate_analysis_html(analysis_data, original_text, filename):
     """Generate a formatted HTML document with analysis results"""
@@ -1466,84 +1460,421 @@ def generate_analysis_html(analysis_data, original_text, filename):
     return html
 
 
-def process_text(text):
+def is_section_header(sentence):
+    """Check if a sentence is a section header (all caps, short, no punctuation except colon)"""
+    return sentence.isupper() and len(sentence.split()) <= 3 and not any(p in sentence for p in '.!?,;')
+
+class AnalysisStats:
+    """
+    Running totals for an analysis, updated one sentence at a time.
+    """
     
-    # Extract all author names from citations for later reference
-    author_names = extract_author_names(text)
+    def __init__(self):
+        self.sentence_count = 0
+        self.citation_count = 0
+        self.content_sentence_count = 0
+        self.move_counts = {
+            "Reporting": 0,
+            "Transforming": 0,
+            "Evaluating": 0,
+            "No Citation": 0
+        }
     
-    # Preprocess and analyze the text
-    analyzed_sentences, all_citations, total_citation_count = preprocess_text(text, author_names)
+    def add(self, sentence_info):
+        """Count an analyzed sentence"""
+        self.sentence_count += 1
+        self.citation_count += sentence_info['citation_count']
+        
+        # Section headers are left out of the move statistics
+        if not is_section_header(sentence_info['sentence']):
+            self.content_sentence_count += 1
+            move = sentence_info['rhetorical_move']
+            if move in self.move_counts:
+                self.move_counts[move] += 1
     
-    # Add rhetorical move analysis using ML models
-    for sentence_info in analyzed_sentences:
-        rhetorical_move, confidence = analyze_rhetorical_moves(sentence_info)
-        sentence_info['rhetorical_move'] = rhetorical_move
-        sentence_info['confidence'] = confidence
+    def remove(self, sentence_info):
+        """Take back a sentence counted earlier (e.g. one replaced by an edit)"""
+        self.sentence_count -= 1
+        self.citation_count -= sentence_info['citation_count']
         
-        # Add citation styles information
-        if sentence_info['has_citation'] and sentence_info['citations']:
-            # Get the raw citations with their styles
-            citations_with_styles = []
-            for citation_text in sentence_info['citations']:
-                # Find the citation with style in all_citations
-                for citation in all_citations:
-                    if citation['text'] == citation_text:
-                        citations_with_styles.append({
-                            'text': citation_text,
-                            'style': citation['style']
-                        })
-                        break
-                else:
-                    # If not found, add as unsure
-                    citations_with_styles.append({
-                        'text': citation_text,
-                        'style': 'Unsure'
-                    })
-            
-            sentence_info['citations_with_styles'] = citations_with_styles
-    
-    # Calculate statistics for rhetorical moves
-    move_counts = {
-        "Reporting": 0,
-        "Transforming": 0,
-        "Evaluating": 0,
-        "No Citation": 0
-    }
-    
-    # Filter out section headers (all caps sentences with no punctuation)
-    content_sentences = []
-    for sentence_info in analyzed_sentences:
-        sentence = sentence_info['sentence']
-        # Check if this is a section header (all caps, short, no punctuation except colon)
-        is_header = sentence.isupper() and len(sentence.split()) <= 3 and not any(p in sentence for p in '.!?,;')
-        if not is_header:
-            content_sentences.append(sentence_info)
+        if not is_section_header(sentence_info['sentence']):
+            self.content_sentence_count -= 1
             move = sentence_info['rhetorical_move']
-            if move in move_counts:
-                move_counts[move] += 1
-    
-    # Calculate percentages using only content sentences
-    total_content_sentences = len(content_sentences)
-    move_percentages = {}
-    for move, count in move_counts.items():
-        percentage = (count / total_content_sentences) * 100 if total_content_sentences > 0 else 0
-        move_percentages[move] = round(percentage, 1)
-    
-    # Debug print to see what's being sent
-    print("All citations:", all_citations)
-    for sentence in analyzed_sentences:
-        if 'citations_with_styles' in sentence:
-            print("Citations with styles:", sentence['citations_with_styles'])
-    
-    return jsonify({
-        'sentence_analysis': analyzed_sentences,
-        'citation_count': total_citation_count,
-        'rhetorical_move_stats': {
-            'counts': move_counts,
-            'percentages': move_percentages
+            if move in self.move_counts:
+                self.move_counts[move] -= 1
+    
+    def load(self, analysis):
+        """Start from the totals of a finished analysis (an /analyze response body)"""
+        self.sentence_count = len(analysis['sentence_analysis'])
+        self.citation_count = analysis['citation_count']
+        self.move_counts = dict(analysis['rhetorical_move_stats']['counts'])
+        # Every content sentence is counted under one of the moves
+        self.content_sentence_count = sum(self.move_counts.values())
+    
+    def summary(self):
+        """Get the citation count and rhetorical move statistics for the sentences so far"""
+        # Calculate percentages using only content sentences
+        move_percentages = {}
+        for move, count in self.move_counts.items():
+            percentage = (count / self.content_sentence_count) * 100 if self.content_sentence_count > 0 else 0
+            move_percentages[move] = round(percentage, 1)
+        
+        return {
+            'citation_count': self.citation_count,
+            'rhetorical_move_stats': {
+                'counts': dict(self.move_counts),
+                'percentages': move_percentages
+            }
         }
-    })
+
+def iter_paragraph_windows(text_or_stream, window_chars=None, first_window_chars=None):
+    """
+    Split a document into windows of whole paragraphs without holding more than a window or two in memory.
+    
+    Args:
+        text_or_stream: The document as a string, a text file object, or an iterable of string chunks
+        window_chars (int): Approximate window size in characters (default ANALYSIS_WINDOW_CHARS)
+        first_window_chars (int): Optional smaller size for the first window; each later window
+            doubles in size up to window_chars
+    
+    Yields:
+        tuple: (window_text, offset) with the window's character offset in the whole document
+    """
+    max_window_chars = window_chars or ANALYSIS_WINDOW_CHARS
+    window_chars = min(first_window_chars or max_window_chars, max_window_chars)
+    if isinstance(text_or_stream, str):
+        chunks = [text_or_stream]
+    elif hasattr(text_or_stream, 'read'):
+        chunks = iter(lambda: text_or_stream.read(STREAM_READ_CHARS), '')
+    else:
+        chunks = text_or_stream
+    
+    buffer = ''
+    buffer_offset = 0
+    start = 0
+    for chunk in chunks:
+        # Drop what has already been handed out before adding the new chunk
+        buffer = buffer[start:] + chunk
+        buffer_offset += start
+        start = 0
+        
+        while len(buffer) - start >= window_chars:
+            # Cut at the last paragraph break inside the window, or the first one after it
+            cut = buffer.rfind('\n\n', start + 1, start + window_chars)
+            if cut == -1:
+                cut = buffer.find('\n\n', start + window_chars)
+                if cut == -1:
+                    # A single paragraph longer than a window: wait for the rest of it
+                    break
+            yield buffer[start:cut], buffer_offset + start
+            start = cut
+            window_chars = min(window_chars * 2, max_window_chars)
+    
+    if buffer[start:].strip():
+        yield buffer[start:], buffer_offset + start
+
+def iter_citation_windows(text_or_stream, scan_mode=None, first_window_chars=None):
+    """
+    Segment a document and detect its citations window by window, without the classifier.
+    
+    Windows are whole paragraphs of about ANALYSIS_WINDOW_CHARS. For a string, the author
+    names of the whole document are gathered in one pass first and applied to every
+    window, so the results do not depend on where the windows are cut. A stream is only
+    read once, so its names are gathered as it goes: names cited in earlier windows
+    are recognised in later ones, but not the other way round.
+    
+    Args:
+        text_or_stream: The document as a string, a text file object, or an iterable of string chunks
+        scan_mode (str): Citation scan mode (default CITATION_SCAN_MODE)
+        first_window_chars (int): Optional smaller first window, for a quicker first result;
+            it only changes how the text is split up, not which author names are used
+    
+    Yields:
+        list: The sentence dicts of each window, in document order, without their rhetorical moves
+    """
+    if scan_mode is None:
+        scan_mode = CITATION_SCAN_MODE
+    
+    # Author names used to spot possessive and narrative references: the same ones a
+    # single-window analysis of the whole string would use, or those found so far in a stream
+    is_text = isinstance(text_or_stream, str)
+    author_names = document_author_names(text_or_stream, scan_mode) if is_text else set()
+    
+    for window, offset in iter_paragraph_windows(text_or_stream, first_window_chars=first_window_chars):
+        # In sentence scan mode the names come from the raw window, references list included
+        if scan_mode == 'sentence' and not is_text:
+            author_names.update(extract_author_names(window))
+        
+        # Nothing after the works cited section is analyzed
+        works_cited = WORKS_CITED.search(window)
+        if works_cited:
+            window = window[:works_cited.start()]
+        
+        analyzed_sentences, _, _ = preprocess_text(window, author_names, scan_mode, offset)
+        yield analyzed_sentences
+        
+        if works_cited:
+            break
+
+def iter_analysis(text_or_stream, stats=None, scan_mode=None, first_window_chars=None):
+    """
+    Analyze a document window by window, yielding each sentence's result as soon as it is ready.
+    
+    Every sentence dict has the same fields as in the /analyze response, including
+    its rhetorical move. Citation detection and the classifier run on windows of whole
+    paragraphs (ANALYSIS_WINDOW_CHARS), so memory stays bounded for book-length input;
+    author names are handled as described in iter_citation_windows.
+    
+    Args:
+        text_or_stream: The document as a string, a text file object, or an iterable of string chunks
+        stats (AnalysisStats): Optional running totals to update as sentences are yielded
+        scan_mode (str): Citation scan mode (default CITATION_SCAN_MODE)
+        first_window_chars (int): Optional smaller first window, for a quicker first result
+    
+    Yields:
+        dict: The analysis of each sentence in document order
+    """
+    for analyzed_sentences in iter_citation_windows(text_or_stream, scan_mode, first_window_chars):
+        # Add rhetorical move analysis using ML models (batched across the window)
+        rhetorical_moves = analyze_rhetorical_moves_batch(analyzed_sentences)
+        for sentence_info, (rhetorical_move, confidence) in zip(analyzed_sentences, rhetorical_moves):
+            sentence_info['rhetorical_move'] = rhetorical_move
+            sentence_info['confidence'] = confidence
+            if stats is not None:
+                stats.add(sentence_info)
+            yield sentence_info
+
+def document_cache_key(text):
+    """
+    Key a document's analysis in the document cache.
+    
+    The exact text is hashed rather than a whitespace-normalized form, because the
+    results carry character offsets into it.
+    """
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def document_etag(text):
+    """ETag for the analysis of a document under the current pipeline"""
+    return hashlib.sha256(f"{document_cache.namespace}|{document_cache_key(text)}".encode('utf-8')).hexdigest()[:32]
+
+def analyze_text(text_or_stream):
+    """
+    Analyze a whole document, using the document cache for strings.
+    
+    Concurrent calls for the same text share one analysis. The returned dict may be
+    shared with the cache and other requests, so callers must not modify it.
+    
+    Returns:
+        dict: The /analyze response body (sentence_analysis, citation_count and rhetorical_move_stats)
+    """
+    if not isinstance(text_or_stream, str):
+        return run_analysis(text_or_stream)
+    
+    cache_key = document_cache_key(text_or_stream)
+    cached = document_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    def compute():
+        result = run_analysis(text_or_stream)
+        document_cache.put(cache_key, result)
+        return result
+    
+    # Requests for a text that is already being analyzed wait for that analysis instead
+    return analysis_flight.do(cache_key, compute)
+
+def run_analysis(text_or_stream):
+    """Analyze a whole document, without the document cache"""
+    stats = AnalysisStats()
+    sentence_analysis = []
+    for sentence_info in iter_analysis(text_or_stream, stats):
+        # Debug print to see what's being sent
+        if 'citations_with_styles' in sentence_info:
+            print("Citations with styles:", sentence_info['citations_with_styles'])
+        sentence_analysis.append(sentence_info)
+    
+    result = {'sentence_analysis': sentence_analysis}
+    result.update(stats.summary())
+    return result
+
+def common_prefix_length(a, b):
+    """Length of the longest common prefix of two strings"""
+    # Binary search over slice comparisons, which run in C, instead of a character loop
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[:middle] == b[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+def common_suffix_length(a, b, limit):
+    """Length of the longest common suffix of two strings, at most limit"""
+    low, high = 0, min(len(a), len(b), limit)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[len(a) - middle:] == b[len(b) - middle:]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+def paragraph_span(text, start, end):
+    """Widen a span of text to the paragraph breaks around it, the way analysis windows are cut"""
+    paragraph_start = text.rfind('\n\n', 0, start)
+    paragraph_end = text.find('\n\n', end)
+    return max(paragraph_start, 0), paragraph_end if paragraph_end != -1 else len(text)
+
+def document_author_names(text, scan_mode):
+    """The author names an analysis of this text would look for in possessive and narrative references"""
+    # Document mode takes them from the normalized text; sentence mode from the raw text, references included
+    if scan_mode == 'document':
+        return extract_author_names(normalize_text(text).text)
+    return extract_author_names(text)
+
+def reanalyze_text(previous_text, previous_analysis, text, scan_mode=None):
+    """
+    Re-analyze an edited version of a document, reusing what has not changed.
+    
+    The two versions are compared to find the edited span, which is widened to whole
+    paragraphs (a sentence or citation never crosses a paragraph break). Only those
+    paragraphs go through segmentation, citation detection and the classifier; the
+    sentences around them are taken from the previous analysis with their offsets
+    shifted, and the move statistics are patched for the sentences that changed.
+    Paragraphs elsewhere are re-analyzed too if the edit changes which author names
+    the document cites, since those names decide its narrative references.
+    
+    Re-analyzed sentences see the author names of the whole document, as every
+    window of a full analysis does, so the result is the same as analyze_text's and is
+    put in the document cache.
+    
+    Args:
+        previous_text (str): The text of the previous version
+        previous_analysis (dict): Its analysis, as returned by analyze_text (it is modified)
+        text (str): The edited text
+        scan_mode (str): Citation scan mode (default CITATION_SCAN_MODE)
+    
+    Returns:
+        tuple: (analysis dict, number of sentences reused from the previous analysis)
+    """
+    if scan_mode is None:
+        scan_mode = CITATION_SCAN_MODE
+    
+    # An unchanged text or a version analyzed before needs no work at all
+    cached = document_cache.get(document_cache_key(text))
+    if cached is not None:
+        return cached, len(cached['sentence_analysis'])
+    if text == previous_text:
+        return previous_analysis, len(previous_analysis['sentence_analysis'])
+    
+    # The edit is what lies between the common prefix and the common suffix
+    prefix = common_prefix_length(previous_text, text)
+    suffix = common_suffix_length(previous_text, text, min(len(previous_text), len(text)) - prefix)
+    shift = len(text) - len(previous_text)
+    region_start, region_end = paragraph_span(text, prefix, len(text) - suffix)
+    
+    # Nothing after the works cited heading is analyzed. If the edit moves the heading,
+    # everything from the edit onwards is re-analyzed
+    previous_cut = WORKS_CITED.search(previous_text)
+    previous_limit = previous_cut.start() if previous_cut else len(previous_text)
+    cut = WORKS_CITED.search(text)
+    limit = cut.start() if cut else len(text)
+    if previous_limit < region_start:
+        cut_moved = limit != previous_limit
+    else:
+        cut_moved = previous_limit < region_end - shift or limit != previous_limit + shift
+    if cut_moved:
+        region_end = len(text)
+    regions = [(region_start, region_end)]
+    
+    # Bring the previous sentences into the edited text's offsets; those in the edit are dropped
+    kept = []
+    dropped = []
+    for sentence_info in previous_analysis['sentence_analysis']:
+        if sentence_info['end'] <= region_start:
+            kept.append(sentence_info)
+        elif not cut_moved and sentence_info['start'] >= region_end - shift:
+            shift_sentence(sentence_info, shift)
+            kept.append(sentence_info)
+        else:
+            dropped.append(sentence_info)
+    
+    # Author names found anywhere in the document mark narrative references everywhere,
+    # so if the edit changes them, the paragraphs mentioning a changed name are redone too
+    author_names = document_author_names(text, scan_mode)
+    edited_names = document_author_names(text[region_start:region_end], scan_mode)
+    previous_edited_names = document_author_names(previous_text[region_start:region_end - shift], scan_mode)
+    if edited_names != previous_edited_names:
+        changed_names = author_names ^ document_author_names(previous_text, scan_mode)
+        if changed_names:
+            matcher = AuthorMatcher(changed_names)
+            for sentence_info in kept:
+                if matcher.find_mentions(sentence_info['sentence']):
+                    regions.append(paragraph_span(text, sentence_info['start'], sentence_info['end']))
+    
+    # Merge overlapping regions and drop the reused sentences inside them
+    regions.sort()
+    merged = []
+    for start, end in regions:
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    if len(merged) > 1:
+        reused = []
+        for sentence_info in kept:
+            if any(sentence_info['start'] < end and sentence_info['end'] > start for start, end in merged):
+                dropped.append(sentence_info)
+            else:
+                reused.append(sentence_info)
+        kept = reused
+    
+    # Analyze the regions like windows of a full analysis, up to the works cited heading
+    analyzed = []
+    for start, end in merged:
+        end = min(end, limit)
+        if start < end and text[start:end].strip():
+            window_sentences, _, _ = preprocess_text(text[start:end], set(author_names), scan_mode, start)
+            analyzed.extend(window_sentences)
+    rhetorical_moves = analyze_rhetorical_moves_batch(analyzed)
+    for sentence_info, (rhetorical_move, confidence) in zip(analyzed, rhetorical_moves):
+        sentence_info['rhetorical_move'] = rhetorical_move
+        sentence_info['confidence'] = confidence
+    
+    # Patch the previous totals instead of recounting the document
+    stats = AnalysisStats()
+    stats.load(previous_analysis)
+    for sentence_info in dropped:
+        stats.remove(sentence_info)
+    for sentence_info in analyzed:
+        stats.add(sentence_info)
+    
+    result = {'sentence_analysis': sorted(kept + analyzed, key=lambda sentence_info: sentence_info['start'])}
+    result.update(stats.summary())
+    document_cache.put(document_cache_key(text), result)
+    return result, len(kept)
+
+def shift_sentence(sentence_info, shift):
+    """Move a sentence's document offsets (and its citations') by shift characters"""
+    sentence_info['start'] += shift
+    sentence_info['end'] += shift
+    for citation in sentence_info.get('citations_with_styles', []):
+        citation['doc_start'] += shift
+        citation['doc_end'] += shift
+
+def process_text(text):
+    # The ETag only depends on the text and the pipeline, so a client that already has
+    # this analysis is answered before anything is looked up
+    etag = document_etag(text)
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        response = jsonify(analyze_text(text))
+    response.set_etag(etag)
+    return response
 
 if __name__ == '__main__':
     nltk.download('punkt')  # Download required NLTK data
+    nltk.download('punkt_tab')  # Punkt model used by newer NLTK releases
     app.run(debug=True, host='0.0.0.0', port=5001)
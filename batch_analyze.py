@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Batch Corpus Analysis
+
+Analyzes every .txt, .docx and .pdf file under a directory from the command line,
+producing the same JSON as /analyze for each one without going through HTTP.
+
+Text extraction, segmentation, citation detection and the rule shortcuts run in a
+pool of worker processes. The sentences the rules cannot decide are sent back to
+the main process, which gathers them from many documents into large shared batches
+for the classifier, so the model is loaded once. Each document's result is written
+as soon as it is complete, and a manifest records every finished document, so an
+interrupted run picks up where it stopped when it is started again.
+
+Usage:
+    python batch_analyze.py submissions/ --output results/ --workers 4
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import app as analysis_app
+from parquet_export import export_results, check_pyarrow
+
+
+SUPPORTED_EXTENSIONS = ('.txt', '.docx', '.pdf')
+
+# One JSON line per finished (or failed) document, appended as the run goes
+MANIFEST_FILE = 'manifest.jsonl'
+
+
+def find_documents(input_dir):
+    """
+    List the documents under a directory.
+
+    Args:
+        input_dir (str): Directory to search, including its subdirectories
+
+    Returns:
+        list: (path, document id) tuples in a stable order; the id is the path
+              relative to input_dir, with forward slashes
+    """
+    documents = []
+    for root, dirs, files in os.walk(input_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS:
+                path = os.path.join(root, name)
+                documents.append((path, os.path.relpath(path, input_dir).replace(os.sep, '/')))
+    return documents
+
+
+def load_manifest(manifest_path):
+    """
+    Read the manifest of an earlier run.
+
+    Returns:
+        dict: Document id to its latest manifest entry
+    """
+    entries = {}
+    if not os.path.exists(manifest_path):
+        return entries
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # A line cut short by an interruption; that document is simply redone
+                continue
+            entries[entry['document']] = entry
+    return entries
+
+
+def file_fingerprint(path):
+    """Size and modification time of a file, to notice documents changed since they were analyzed."""
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def prepare_document(path):
+    """
+    Extract a document and run everything but the classifier on it (runs in a worker process).
+
+    Args:
+        path (str): Path of the document
+
+    Returns:
+        dict: 'sentences' (sentence dicts, with the moves the rules decided), 'pending'
+              (indices of the sentences that need the classifier) and 'timings'
+    """
+    start_time = time.perf_counter()
+    text = analysis_app.extract_text_from_file(path, os.path.basename(path), raise_errors=True)
+    if not text.strip():
+        raise ValueError('Could not extract any text')
+    extracted_time = time.perf_counter()
+
+    sentences = []
+    pending = []
+    for window_sentences in analysis_app.iter_citation_windows(text):
+        for sentence_info in window_sentences:
+            shortcut = analysis_app.apply_rule_shortcuts(sentence_info)
+            if shortcut is None:
+                pending.append(len(sentences))
+            else:
+                sentence_info['rhetorical_move'], sentence_info['confidence'] = shortcut
+            sentences.append(sentence_info)
+
+    return {
+        'sentences': sentences,
+        'pending': pending,
+        'timings': {
+            'extract': extracted_time - start_time,
+            'rules': time.perf_counter() - extracted_time
+        }
+    }
+
+
+class _Document:
+    """A prepared document waiting for its classifier results."""
+
+    def __init__(self, document_id, fingerprint, prepared):
+        self.document_id = document_id
+        self.fingerprint = fingerprint
+        self.sentences = prepared['sentences']
+        self.pending = prepared['pending']
+        self.remaining = len(self.pending)
+
+
+class InferenceStage:
+    """
+    Classifies the sentences that need the model in batches shared across documents.
+    """
+
+    def __init__(self, batch_size=256):
+        self.batch_size = batch_size
+        self._queue = []
+
+        self.seconds = 0.0
+        self.sentences = 0
+        self.batches = 0
+
+    def add(self, document):
+        """
+        Queue a document's undecided sentences.
+
+        Returns:
+            list: The document itself if the rules decided all of its sentences, else nothing
+        """
+        if not document.remaining:
+            return [document]
+        self._queue.extend((document, index) for index in document.pending)
+        return []
+
+    def flush(self, force=False):
+        """
+        Classify queued sentences in full batches, or everything queued when force is set.
+
+        Returns:
+            list: The documents that are now complete
+        """
+        finished = []
+        while len(self._queue) >= self.batch_size or (force and self._queue):
+            batch = self._queue[:self.batch_size]
+            del self._queue[:self.batch_size]
+
+            start_time = time.perf_counter()
+            sentence_infos = [document.sentences[index] for document, index in batch]
+            probabilities = analysis_app.rhetorical_classifier.predict_probabilities(
+                [sentence_info['sentence'] for sentence_info in sentence_infos]
+            )
+            for (document, index), sentence_info, sentence_probabilities in zip(batch, sentence_infos, probabilities):
+                rhetorical_move, confidence = analysis_app.resolve_model_prediction(sentence_info, sentence_probabilities)
+                sentence_info['rhetorical_move'] = rhetorical_move
+                sentence_info['confidence'] = confidence
+                document.remaining -= 1
+                if not document.remaining:
+                    finished.append(document)
+            self.seconds += time.perf_counter() - start_time
+            self.sentences += len(batch)
+            self.batches += 1
+        return finished
+
+
+def write_result(output_dir, document):
+    """
+    Write a finished document's analysis next to the others.
+
+    Returns:
+        tuple: (path of the result relative to output_dir, the analysis dict)
+    """
+    stats = analysis_app.AnalysisStats()
+    for sentence_info in document.sentences:
+        stats.add(sentence_info)
+    analysis = {'sentence_analysis': document.sentences}
+    analysis.update(stats.summary())
+
+    relative_path = document.document_id + '.json'
+    result_path = os.path.join(output_dir, relative_path)
+    os.makedirs(os.path.dirname(result_path), exist_ok=True)
+    # Write to a temporary file first so an interruption never leaves half a result
+    temporary_path = result_path + '.tmp'
+    with open(temporary_path, 'w', encoding='utf-8') as f:
+        json.dump(analysis, f)
+    os.replace(temporary_path, result_path)
+    return relative_path, analysis
+
+
+def append_manifest(manifest, entry):
+    """Record a finished document; flushed to disk right away so a crash loses nothing already done."""
+    manifest.write(json.dumps(entry) + '\n')
+    manifest.flush()
+    os.fsync(manifest.fileno())
+
+
+def run_batch(input_dir, output_dir, workers=None, batch_size=256, restart=False):
+    """
+    Analyze every document under input_dir, resuming an earlier run in output_dir.
+
+    Args:
+        input_dir (str): Directory of .txt, .docx and .pdf files
+        output_dir (str): Where each result (<document id>.json) and the manifest go
+        workers (int): Number of worker processes (default: one per CPU)
+        batch_size (int): Sentences per shared classifier batch
+        restart (bool): Ignore the manifest and analyze everything again
+
+    Returns:
+        dict: Counts and per-stage timings of the run
+    """
+    workers = workers or os.cpu_count() or 1
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+    if restart and os.path.exists(manifest_path):
+        os.remove(manifest_path)
+
+    # Documents already analyzed with the same pipeline and unchanged since are skipped
+    pipeline = analysis_app.document_cache.namespace
+    previous = load_manifest(manifest_path)
+    todo = []
+    skipped = 0
+    for path, document_id in find_documents(input_dir):
+        fingerprint = file_fingerprint(path)
+        entry = previous.get(document_id)
+        if (entry and entry['status'] == 'done' and entry['pipeline'] == pipeline
+                and entry['size'] == fingerprint['size'] and entry['mtime_ns'] == fingerprint['mtime_ns']
+                and os.path.exists(os.path.join(output_dir, entry['output']))):
+            skipped += 1
+            continue
+        todo.append((path, document_id, fingerprint))
+    print(f"Found {len(todo) + skipped} documents, {skipped} already done, {len(todo)} to analyze with {workers} workers")
+
+    timings = {'extract': 0.0, 'rules': 0.0, 'write': 0.0}
+    counts = {'done': 0, 'failed': 0, 'sentences': 0}
+    inference = InferenceStage(batch_size)
+    start_time = time.perf_counter()
+
+    # Forked workers share the already imported app instead of loading everything again
+    if 'fork' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('fork')
+    else:
+        context = multiprocessing.get_context()
+
+    def finish(document, manifest):
+        write_start = time.perf_counter()
+        relative_path, analysis = write_result(output_dir, document)
+        append_manifest(manifest, dict(
+            document.fingerprint,
+            document=document.document_id,
+            status='done',
+            output=relative_path,
+            pipeline=pipeline,
+            sentences=len(document.sentences),
+            citations=analysis['citation_count'],
+            finished_at=time.time()
+        ))
+        counts['done'] += 1
+        counts['sentences'] += len(document.sentences)
+        timings['write'] += time.perf_counter() - write_start
+
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+    interrupted = False
+    with open(manifest_path, 'a', encoding='utf-8') as manifest:
+        try:
+            remaining = iter(todo)
+            in_flight = {}
+            while True:
+                # Keep the pool busy without holding more than a few documents per worker in memory
+                for path, document_id, fingerprint in remaining:
+                    in_flight[executor.submit(prepare_document, path)] = (document_id, fingerprint)
+                    if len(in_flight) >= workers * 2:
+                        break
+                if not in_flight:
+                    break
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                finished = []
+                for future in done:
+                    document_id, fingerprint = in_flight.pop(future)
+                    try:
+                        prepared = future.result()
+                    except Exception as e:
+                        print(f"✗ {document_id}: {e}")
+                        append_manifest(manifest, dict(
+                            fingerprint,
+                            document=document_id,
+                            status='failed',
+                            error=str(e),
+                            pipeline=pipeline,
+                            finished_at=time.time()
+                        ))
+                        counts['failed'] += 1
+                        continue
+                    timings['extract'] += prepared['timings']['extract']
+                    timings['rules'] += prepared['timings']['rules']
+                    finished.extend(inference.add(_Document(document_id, fingerprint, prepared)))
+
+                # Run full batches while the workers carry on; once nothing is being prepared, run the rest
+                finished.extend(inference.flush(force=not in_flight))
+                for document in finished:
+                    finish(document, manifest)
+                    print(f"✓ {document.document_id}: {len(document.sentences)} sentences")
+        except KeyboardInterrupt:
+            interrupted = True
+            print("Interrupted; run the same command again to resume")
+        finally:
+            executor.shutdown(wait=not interrupted, cancel_futures=True)
+
+    elapsed = time.perf_counter() - start_time
+    return {
+        'documents': counts['done'],
+        'failed': counts['failed'],
+        'skipped': skipped,
+        'sentences': counts['sentences'],
+        'interrupted': interrupted,
+        'seconds': elapsed,
+        'documents_per_second': counts['done'] / elapsed if elapsed else 0.0,
+        'sentences_per_second': counts['sentences'] / elapsed if elapsed else 0.0,
+        'timings': dict(timings, inference=inference.seconds),
+        'inference_batches': inference.batches,
+        'inference_sentences': inference.sentences,
+        'workers': workers
+    }
+
+
+def print_summary(summary):
+    """Print throughput and where the time went."""
+    print(f"\n✓ Analyzed {summary['documents']} documents ({summary['failed']} failed, "
+          f"{summary['skipped']} skipped) in {summary['seconds']:.1f}s: "
+          f"{summary['documents_per_second']:.2f} documents/s, {summary['sentences_per_second']:.1f} sentences/s")
+    print(f"Stage timings (extraction and rules are summed over {summary['workers']} worker processes):")
+    print(f"  extract    {summary['timings']['extract']:8.2f}s")
+    print(f"  rules      {summary['timings']['rules']:8.2f}s")
+    print(f"  inference  {summary['timings']['inference']:8.2f}s "
+          f"({summary['inference_sentences']} sentences in {summary['inference_batches']} batches)")
+    print(f"  write      {summary['timings']['write']:8.2f}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze a directory of .txt, .docx and .pdf documents")
+    parser.add_argument("input_dir", help="Directory of documents (searched recursively)")
+    parser.add_argument("--output", default="batch_results", help="Directory for the results and the manifest")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--batch-size", type=int, default=256, help="Sentences per shared classifier batch")
+    parser.add_argument("--restart", action="store_true", help="Ignore the manifest and analyze everything again")
+    parser.add_argument("--parquet", metavar="DIR",
+                        help="Afterwards, export all finished results as Parquet tables to this directory")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.input_dir):
+        parser.error(f"{args.input_dir} is not a directory")
+    if args.parquet:
+        # Fail now rather than after the whole corpus has been analyzed
+        try:
+            check_pyarrow()
+        except ImportError as e:
+            parser.error(str(e))
+
+    summary = run_batch(args.input_dir, args.output, args.workers, args.batch_size, args.restart)
+    print_summary(summary)
+    if summary['interrupted']:
+        return 1
+    
+    if args.parquet:
+        counts = export_results(args.output, args.parquet)
+        print(f"✓ Exported {counts['sentences']} sentence rows and {counts['citations']} citation rows to {args.parquet}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
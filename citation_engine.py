@@ -0,0 +1,667 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Citation Engine
+
+Citation detection for SourceMapper, built once at import time from declarative
+pattern tables. Every pattern is compiled a single time. The implicit-reference
+families sit behind one combined alternation scanner, and each formal citation
+pattern lists the literals it needs, so most patterns are rejected with a substring
+check instead of a regex pass over the sentence.
+"""
+
+import re
+import bisect
+
+# ===== IMPLICIT CITATION PATTERNS =====
+# Each family is checked in order and the first matching pattern wins, so the
+# order within a family matters. The first family with a match sets the move type.
+IMPLICIT_FAMILIES = [
+    {
+        # REPORTING MOVE PATTERNS (directly reporting what sources say)
+        'move': 'Reporting',
+        'patterns': [
+            r'\b(?:according to|as stated by|as reported by|as noted by|as observed by)\b',
+            r'\b(?:they|he|she|it)\s+(?:state|report|note|observe|mention|describe|explain|define|clarify)s?\b',
+            r'\b(?:their|his|her|its)\s+(?:statement|report|observation|description|explanation|definition)s?\b',
+            r'\b(?:in the words of|quoted from|directly from)\b',
+            r'\bidentifies\b'
+        ],
+        # For reporting patterns, extract just the author name if possible
+        'author_pattern': r'According to\s+([\w]+)',
+        'author_style': 'Narrative APA',
+        'fallback': 'match'
+    },
+    {
+        # EVALUATING MOVE PATTERNS (critiquing or analyzing sources)
+        'move': 'Evaluating',
+        'patterns': [
+            r'\b(?:overlooks|fails to|neglects|ignores|misses|omits|lacks|inadequately|insufficiently)\b',
+            r'\b(?:their|his|her|its)\s+(?:critique|criticism|assessment|evaluation|limitation|weakness|strength|advantage|shortcoming|gap|flaw|merit)s?\b',
+            r'\b(?:they|he|she|it)\s+(?:critiques|criticizes|assesses|evaluates|challenges|questions|contests|disputes|refutes|counters)\b',
+            r'\b(?:however|nevertheless|nonetheless|although|though|despite|in spite of|yet|but|conversely|in contrast|on the contrary|on the other hand)\b',
+            r'\b(?:problematic|questionable|debatable|controversial|unconvincing|unsupported|unsubstantiated|flawed|limited|narrow|biased|misleading)\b',
+            r'\b(?:critically|insightfully|perceptively|astutely|shrewdly)\b',
+            r'\b(?:strength|weakness|merit|limitation|advantage|disadvantage|benefit|drawback|shortcoming|gap|flaw)s?\b'
+        ],
+        # For evaluating patterns, just extract the author name if mentioned
+        'author_pattern': r'([\w]+)[\s\']s\s+(?:approach|framework|model|theory)',
+        'author_style': 'Narrative APA',
+        'fallback': 'implicit'
+    },
+    {
+        # TRANSFORMING MOVE PATTERNS (paraphrasing or synthesizing)
+        'move': 'Transforming',
+        'patterns': [
+            r'\b(?:their|his|her|its)\s+(?:findings|research|study|analysis|work|paper|article|results|approach|methodology|framework|model|theory|concept|perspective)s?\b',
+            r'\b(?:they|he|she|it)\s+(?:found|discovered|reported|showed|demonstrated|argued|suggested|proposed|developed|established|determined|concluded|identified)\b',
+            r'\b(?:these|those|this|that)\s+(?:findings|results|studies|researchers|authors|scholars|studies|papers|articles|analyses)\b',
+            r'\b(?:according to|as per)\s+(?:them|him|her|it)\b',
+            r'\b(?:similar|similarly|likewise|in the same way|in a similar manner)\b',
+            r'\b(?:building on|extending|drawing from|synthesizing|combining|integrating)\b',
+            r'\bcase\s+(?:study|studies|analysis|analyses)\b'
+        ],
+        # Transforming references are never tied to a specific author
+        'author_pattern': None,
+        'author_style': None,
+        'fallback': 'implicit'
+    }
+]
+
+# ===== FORMAL CITATION PATTERNS =====
+# Applied in order. Each entry describes how a match becomes a citation dict:
+#   lead        - zero-width assertion placed before the pattern when scanning. The leftmost
+#                 match of a pattern that opens with a greedy word run can only begin where
+#                 that run begins, so this rejects every other position without changing the
+#                 result. Without it the engine backtracks through each word of the text.
+#   requires    - literals that must all be in the sentence for the pattern to be tried
+#                 (checked against the lowercased sentence for IGNORECASE patterns)
+#   template    - format string over the match groups for the citation text
+#   style       - citation style recorded on the citation
+#   year_group  - group holding a year to remember (suppresses later MLA/page duplicates)
+#   strip       - strip stray commas and whitespace from the groups before formatting
+#   span_group  - group whose span is recorded, when the citation is only part of the match
+#   rule        - optional extra checks before a match is added (see _passes_rule)
+CITATION_PATTERNS = [
+    # ===== APA CITATION FORMATS =====
+    # 1. Single author: Smith (2020)
+    {'pattern': r'([\w]+)\s+\((\d{4})\)', 'lead': r'\b', 'requires': ('(',), 'template': '{0} ({1})', 'style': 'APA', 'year_group': 1},
+    # 2. Two authors: Smith and Johnson (2020)
+    {'pattern': r'([\w]+)\s+and\s+([\w]+)\s+\((\d{4})\)', 'lead': r'\b', 'requires': ('(', 'and'), 'template': '{0} and {1} ({2})', 'style': 'APA', 'year_group': 2},
+    # 3. Multiple authors with et al.: Smith et al. (2020)
+    {'pattern': r'([\w]+)\s+et\s+al\.?\s+\((\d{4})\)', 'lead': r'\b', 'requires': ('(', 'et', 'al'), 'template': '{0} et al. ({1})', 'style': 'APA', 'year_group': 1},
+    # 4. Three authors: Smith, Johnson, and Lee (2020)
+    {'pattern': r'([\w]+),\s+([\w]+),\s+and\s+([\w]+)\s+\((\d{4})\)', 'lead': r'\b', 'requires': ('(', ',', 'and'), 'template': '{0}, {1}, and {2} ({3})', 'style': 'APA', 'year_group': 3},
+    # 4. Four+ authors: Smith et al. (2020)
+    {'pattern': r'([\w]+)\s+et\s+al\.\s+\((\d{4})\)', 'lead': r'\b', 'requires': ('(', 'et', 'al.'), 'template': '{0} et al. ({1})', 'style': 'APA', 'year_group': 1},
+    # 5. Report with year: IPCC report (2022)
+    {'pattern': r'([\w\s]+)\s+report\s+\((\d{4})\)', 'lead': r'(?<![\w\s])', 'requires': ('(', 'report'), 'flags': re.IGNORECASE, 'template': '{0} report ({1})', 'style': 'APA', 'year_group': 1},
+    # 6. Multiple authors with page number in parentheses: (Chen et al. 2018, p. 42)
+    {'pattern': r'\(([\w]+)\s+et\s+al\.\s+(\d{4}),\s+p\.\s+(\d+)\)', 'requires': ('(', 'et', 'al.', 'p.'), 'template': '({0} et al. {1}, p. {2})', 'style': 'APA', 'year_group': 1},
+    # 7. Two authors with comma before year: (Reynolds and Ahmed, 2021)
+    {'pattern': r'\(([\w]+)\s+and\s+([\w]+),\s+(\d{4})\)', 'requires': ('(', 'and', ','), 'template': '({0} and {1}, {2})', 'style': 'APA', 'year_group': 2},
+    # 8. Multiple authors with comma before year: (Johnson et al., 2021)
+    {'pattern': r'\(([\w]+)\s+et\s+al\.,\s+(\d{4})\)', 'requires': ('(', 'et', 'al.,'), 'template': '({0} et al., {1})', 'style': 'APA', 'year_group': 1},
+    # 9. Author with page range: (Wilson, 2019, pp. 78-92)
+    {'pattern': r'\(([\w]+),\s+(\d{4}),\s+pp\.\s+(\d+)-(\d+)\)', 'requires': ('(', 'pp.'), 'flags': re.IGNORECASE, 'template': '({0}, {1}, pp. {2}-{3})', 'style': 'APA', 'year_group': 1},
+    # 9b. Alternative pattern for page range with more flexible spacing
+    {'pattern': r'\(\s*([\w]+)\s*,\s*(\d{4})\s*,\s*pp\.\s*(\d+)\s*-\s*(\d+)\s*\)', 'requires': ('(', 'pp.'), 'flags': re.IGNORECASE, 'template': '({0}, {1}, pp. {2}-{3})', 'style': 'APA', 'year_group': 1, 'rule': 'new_text'},
+    # 10. Two authors with page number: (Garcia and Martinez, 2022, p. 215)
+    {'pattern': r'\(([\w]+)\s+and\s+([\w]+),\s+(\d{4}),\s+p\.\s+(\d+)\)', 'requires': ('(', 'and', 'p.'), 'template': '({0} and {1}, {2}, p. {3})', 'style': 'APA', 'year_group': 2},
+
+    # ===== MLA CITATION FORMATS =====
+    # 1. One author with page number: (Johnson 42)
+    {'pattern': r'\(([\w]+)\s+(\d+)\)', 'requires': ('(',), 'template': '{0} {1}', 'style': 'MLA', 'rule': 'not_apa_year:1'},
+    # 2. Two authors with year: (Thompson and Lee 2018)
+    {'pattern': r'\(([\w]+)\s+and\s+([\w]+)\s+(\d{4})\)', 'requires': ('(', 'and'), 'template': '{0} and {1} {2}', 'style': 'MLA', 'year_group': 2},
+    # 3. Two authors without page numbers: (Smith and Johnson)
+    {'pattern': r'\(([\w]+)\s+and\s+([\w]+)\)', 'requires': ('(', 'and'), 'template': '{0} and {1}', 'style': 'MLA'},
+    # 4. Three authors with page numbers: (Chen, Roberts and Williams 78)
+    {'pattern': r'\(([\w]+),\s+([\w]+),\s+and\s+([\w]+)\s+(\d+)\)', 'requires': ('(', ',', 'and'), 'template': '{0}, {1} and {2} {3}', 'style': 'MLA'},
+    # 5. Three authors without page numbers: (Smith, Johnson and Lee)
+    {'pattern': r'\(([\w]+),\s+([\w]+),\s+and\s+([\w]+)\)', 'requires': ('(', ',', 'and'), 'template': '{0}, {1} and {2}', 'style': 'MLA'},
+    # 6. Four+ author citations with page number: (Davis et al. 45)
+    {'pattern': r'\(([\w]+)\s+et\s+al\.\s+(\d+)\)', 'requires': ('(', 'et', 'al.'), 'template': '{0} et al. {1}', 'style': 'MLA'},
+    # 7. Four+ author citations without page numbers: (Smith et al.)
+    {'pattern': r'\(([\w]+)\s+et al\.\)', 'requires': ('(', 'et al.)'), 'template': '{0} et al.', 'style': 'MLA'},
+    # 8. Citations with quoted material: ("Climate Report")
+    {'pattern': r'\(\"(.*?)"\)', 'requires': ('("', '")'), 'template': '"{0}"', 'style': 'MLA'},
+    # 9. Single author without page number: (Smith)
+    {'pattern': r'\(([\w]+)\)', 'requires': ('(',), 'template': '{0}', 'style': 'MLA', 'rule': 'not_apa_year:0,new_first_word'},
+    # 10. Narrative citations: As noted by Roberts
+    {'pattern': r'(?:noted|mentioned|stated|cited|according to|as per)\s+by\s+([\w]+)', 'requires': ('by',), 'flags': re.IGNORECASE, 'template': '{0}', 'style': 'Unsure', 'span_group': 1, 'rule': 'new_first_word'},
+    # 11. Page number only citations: (42)
+    {'pattern': r'\((\d+)\)', 'requires': ('(',), 'template': 'p.{0}', 'style': 'MLA', 'rule': 'not_apa_year:0,new_page'},
+    # 12. Detect citations with year at the end of sentence like "...cognitive processes (Mislevy, 2018)."
+    {'pattern': r'\((\w+),?\s+(\d{4})\)', 'requires': ('(',), 'template': '{0} ({1})', 'style': 'APA', 'year_group': 1, 'strip': True, 'rule': 'new_author_year'},
+]
+
+# 13. Detect in-text citations like "According to Abrams" or "Baptista and Gradim explore"
+# Every captured group is a separate author
+AUTHOR_SIGNAL_PATTERNS = [
+    r'(?:According to|as stated by|as noted by|as mentioned by|as argued by|as claimed by|as shown by|as demonstrated by|as explained by)\s+([A-Z][\w]+)',
+    r'([A-Z][\w]+)\s+(?:states|argues|claims|notes|mentions|shows|demonstrates|explains|explores|examines|investigates|analyzes|discusses|suggests|proposes|concludes)',
+    r'([A-Z][\w]+)\s+and\s+([A-Z][\w]+)\s+(?:state|argue|claim|note|mention|show|demonstrate|explain|explore|examine|investigate|analyze|discuss|suggest|propose|conclude)'
+]
+
+
+
+def _alternation(patterns, flags=0):
+    """
+    Combine patterns into one compiled scanner that matches wherever any of them would.
+
+    A leading word boundary shared by every pattern is hoisted out of the alternation,
+    so positions that cannot start a word are rejected before any branch is tried.
+    """
+    if all(pattern.startswith(r'\b') for pattern in patterns):
+        return re.compile(r'\b(?:' + '|'.join(f'(?:{pattern[2:]})' for pattern in patterns) + ')', flags)
+    return re.compile('|'.join(f'(?:{pattern})' for pattern in patterns), flags)
+
+
+def _compile_tables():
+    """Compile every pattern once and build the combined scanners that guard each group."""
+    families = []
+    for family in IMPLICIT_FAMILIES:
+        families.append(dict(
+            family,
+            regexes=[re.compile(pattern, re.IGNORECASE) for pattern in family['patterns']],
+            author_regex=re.compile(family['author_pattern'], re.IGNORECASE) if family['author_pattern'] else None
+        ))
+    # One pass decides whether any implicit family needs to be checked at all
+    implicit_scanner = _alternation([p for family in IMPLICIT_FAMILIES for p in family['patterns']], re.IGNORECASE)
+
+    citation_patterns = []
+    for entry in CITATION_PATTERNS:
+        flags = entry.get('flags', 0)
+        rules = []
+        for rule in entry.get('rule', '').split(','):
+            if not rule:
+                continue
+            name, _, argument = rule.partition(':')
+            rules.append((name, int(argument) if argument else None))
+        requires = entry['requires']
+        if flags & re.IGNORECASE:
+            requires = tuple(literal.lower() for literal in requires)
+        citation_patterns.append(dict(
+            entry,
+            regex=re.compile(entry.get('lead', '') + entry['pattern'], flags),
+            anchor_regex=re.compile(entry['pattern'], flags),
+            requires=requires,
+            ignore_case=bool(flags & re.IGNORECASE),
+            rules=rules
+        ))
+
+    # The signal phrases start with a capital letter, which the regex engine already
+    # scans for quickly on its own; an alternation over them would lose that
+    signal_regexes = [re.compile(pattern) for pattern in AUTHOR_SIGNAL_PATTERNS]
+
+    return families, implicit_scanner, citation_patterns, signal_regexes
+
+
+IMPLICIT_REGEXES, IMPLICIT_SCANNER, CITATION_REGEXES, AUTHOR_SIGNAL_REGEXES = _compile_tables()
+
+
+WORD = re.compile(r'\w+')
+
+
+class _CitationIndex:
+    """
+    Hash-set views of the citations found so far in a sentence.
+
+    Lets the "already cited" checks run in constant time instead of looping over
+    every earlier citation. Words are compared whole, so "Lee" no longer counts as
+    already cited just because "Leeds (2019)" was.
+    """
+
+    def __init__(self):
+        self.texts = set()
+        self.first_words = set()
+        self.words = set()
+        self.word_year_pairs = set()
+
+    def add(self, citation):
+        text = citation['text']
+        words = WORD.findall(text)
+        self.texts.add(text)
+        self.first_words.add(text.split()[0])
+        self.words.update(words)
+        years = [word for word in words if len(word) == 4 and word.isdigit()]
+        self.word_year_pairs.update((word, year) for word in words for year in years)
+
+
+def _is_recorded_year(value, apa_years):
+    """Whether a captured number is a plausible year already used by an APA citation."""
+    return value.isdigit() and len(value) == 4 and 1900 <= int(value) <= 2100 and value in apa_years
+
+
+def _passes_rule(rule, argument, groups, text, index, apa_years):
+    """Apply one of the extra checks a pattern can require before its match is kept."""
+    if rule == 'not_apa_year':
+        # Skip if this looks like an author with year that's already in APA citations
+        return not _is_recorded_year(groups[argument], apa_years)
+    if rule == 'new_text':
+        # Check if this citation has already been added
+        return text not in index.texts
+    if rule == 'new_first_word':
+        # Skip if this author is already part of another citation
+        return groups[0] not in index.first_words
+    if rule == 'new_page':
+        # Check if this page number is already part of another citation
+        page = groups[0]
+        return page not in index.words and page not in index.texts
+    if rule == 'new_author_year':
+        # Skip if this citation is already detected
+        return tuple(groups) not in index.word_year_pairs
+    return True
+
+
+def _deduplicate(citations):
+    """
+    Drop repeated citations with a sort-and-sweep over their spans.
+
+    Citations are visited in position order, longest first at each start, so a span
+    that lies inside or overlaps one already kept is dropped without comparing every
+    pair. Implicit citations stand for a phrase rather than a reference: one quoting
+    its phrase is only dropped when the phrase lies inside a kept citation, and the
+    "Implicit Citation" placeholder is never dropped by span. Repeated texts are
+    caught by set membership; a repeat still covers its span, so matches nested in
+    it are dropped too. A bare name is dropped when it is already a word of a
+    fuller citation in the same sentence, e.g. "Smith" next to "(Smith, 2020)".
+
+    Args:
+        citations (list): Citation dicts with 'text', 'style', 'start' and 'end'
+
+    Returns:
+        list: The kept citations, sorted by position
+    """
+    kept = []
+    seen_texts = set()
+    covered_until = -1
+    for citation in sorted(citations, key=lambda c: (c['start'], -c['end'])):
+        if citation['text'] in seen_texts:
+            # A repeated citation is not kept, but the matches nested inside it must still be dropped
+            if citation['style'] != 'Implicit':
+                covered_until = max(covered_until, citation['end'])
+            continue
+        if citation['style'] == 'Implicit':
+            if citation.get('is_demonstrative') and citation['end'] <= covered_until:
+                continue
+        elif citation['start'] < covered_until:
+            continue
+        else:
+            covered_until = citation['end']
+        seen_texts.add(citation['text'])
+        kept.append(citation)
+
+    cited_words = set()
+    for citation in kept:
+        words = WORD.findall(citation['text'])
+        if len(words) > 1:
+            cited_words.update(words)
+    return [c for c in kept if ' ' in c['text'] or c['text'] not in cited_words]
+
+
+def _implicit_citation(search, base):
+    """
+    Build the implicit reference that sets the sentence's rhetorical move type, if any.
+
+    Args:
+        search (callable): Returns the first match of a regex in the sentence, or None
+        base (int): Position of the sentence start in the string the matches came from
+
+    Returns:
+        dict: The implicit citation, or None
+    """
+    for family in IMPLICIT_REGEXES:
+        for regex in family['regexes']:
+            match = search(regex)
+            if not match:
+                continue
+            author_match = search(family['author_regex']) if family['author_regex'] else None
+            if author_match:
+                return {
+                    'text': author_match.group(1),
+                    'style': family['author_style'],
+                    'is_narrative': True,
+                    'start': author_match.start(1) - base,
+                    'end': author_match.end(1) - base
+                }
+            if family['fallback'] == 'match':
+                # If no clear author, use the pattern match
+                return {
+                    'text': match.group(0),
+                    'style': 'Implicit',
+                    'is_demonstrative': True,
+                    'start': match.start() - base,
+                    'end': match.end() - base
+                }
+            # If no clear reference, use a minimal representation anchored on the phrase that implied it
+            return {
+                'text': "Implicit Citation",
+                'style': 'Implicit',
+                'start': match.start() - base,
+                'end': match.end() - base
+            }
+    return None
+
+
+def _assemble_citations(implicit_citation, entry_matches, signal_matches, base, offset):
+    """
+    Turn one sentence's raw pattern matches into its final, deduplicated citations.
+
+    Shared by the sentence-by-sentence and whole-document scanners, so both apply
+    the same pattern order, rules and deduplication.
+
+    Args:
+        implicit_citation (dict): The sentence's implicit citation, or None
+        entry_matches (list): For each entry of CITATION_REGEXES, its matches in the sentence
+        signal_matches (list): For each of AUTHOR_SIGNAL_REGEXES, its matches in the sentence
+        base (int): Position of the sentence start in the string the matches came from
+        offset (int): Character offset of the sentence within the document
+
+    Returns:
+        tuple: (list of citation dicts sorted by position, citation count)
+    """
+    # Initialize the citations list with dictionaries containing text and style
+    citations = []
+
+    # Track years in APA citations to avoid duplication
+    apa_years = set()
+    index = _CitationIndex()
+
+    if implicit_citation is not None:
+        citations.append(implicit_citation)
+        index.add(implicit_citation)
+
+    for entry, matches in zip(CITATION_REGEXES, entry_matches):
+        for match in matches:
+            groups = match.groups()
+            if entry.get('strip'):
+                groups = tuple(group.rstrip(',').strip() for group in groups)
+            text = entry['template'].format(*groups)
+            if not all(_passes_rule(rule, argument, groups, text, index, apa_years)
+                       for rule, argument in entry['rules']):
+                continue
+            span_group = entry.get('span_group', 0)
+            citation = {
+                'text': text,
+                'style': entry['style'],
+                'start': match.start(span_group) - base,
+                'end': match.end(span_group) - base
+            }
+            citations.append(citation)
+            index.add(citation)
+            if 'year_group' in entry:
+                apa_years.add(groups[entry['year_group']])
+
+    for matches in signal_matches:
+        for match in matches:
+            for group, author in enumerate(match.groups(), 1):
+                # Skip if this author is already part of another citation
+                author_already_cited = author in index.words
+                if not author_already_cited and len(author) > 1:  # Ensure it's a real name
+                    citation = {
+                        'text': author,
+                        'style': 'Narrative',
+                        'start': match.start(group) - base,
+                        'end': match.end(group) - base
+                    }
+                    citations.append(citation)
+                    index.add(citation)
+
+    # Drop contained, overlapping and repeated citations; the result is sorted by position
+    sorted_unique_citations = _deduplicate(citations)
+    for citation in sorted_unique_citations:
+        citation['doc_start'] = offset + citation['start']
+        citation['doc_end'] = offset + citation['end']
+    citation_count = len(sorted_unique_citations)
+
+    return sorted_unique_citations, citation_count
+
+
+def _has_required_literals(entry, text, text_lower):
+    """Whether every literal a pattern needs occurs in the text."""
+    haystack = text_lower if entry['ignore_case'] else text
+    return all(literal in haystack for literal in entry['requires'])
+
+
+def identify_citations(s, author_names=None, offset=0):
+    """
+    Identify the citations in a sentence.
+
+    Every citation records the character span it was matched on: 'start' and 'end'
+    within the sentence, and 'doc_start' and 'doc_end' within the document.
+
+    Args:
+        s (str): The sentence to scan
+        author_names (set): Author names known from the rest of the document
+        offset (int): Character offset of the sentence within the document
+
+    Returns:
+        tuple: (list of citation dicts sorted by position, citation count)
+    """
+    # Initialize author_names if not provided
+    if author_names is None:
+        author_names = set()
+
+    implicit_citation = None
+    if IMPLICIT_SCANNER.search(s) is not None:
+        implicit_citation = _implicit_citation(lambda regex: regex.search(s), 0)
+
+    # Skip patterns whose required literals are missing without running the regex
+    s_lower = s.lower()
+    entry_matches = [
+        list(entry['regex'].finditer(s)) if _has_required_literals(entry, s, s_lower) else []
+        for entry in CITATION_REGEXES
+    ]
+    signal_matches = [list(regex.finditer(s)) for regex in AUTHOR_SIGNAL_REGEXES]
+
+    return _assemble_citations(implicit_citation, entry_matches, signal_matches, 0, offset)
+
+
+# ===== AUTHOR MENTIONS =====
+# Verbs that make a known author's name a narrative reference (e.g., "Johnson argues")
+AUTHOR_REFERENCE_VERBS = [
+    'argues', 'claims', 'states', 'suggests', 'notes', 'observes', 'finds', 'proposes', 'demonstrates', 'shows'
+]
+
+
+def _trie_pattern(words):
+    """
+    Build a regex alternation shaped like a prefix trie of the given words.
+
+    Words sharing a prefix share one branch, so the regex engine walks each position
+    of the text through the trie once instead of trying every word in turn.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}  # end of a word
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # A word can end here, so the longer words below are optional
+        return f'(?:{body})?' if '' in node else body
+
+    return build(trie)
+
+
+class AuthorMatcher:
+    """
+    Finds possessive ("Johnson's") and narrative ("Johnson argues") mentions of known
+    authors in a single pass over the text.
+
+    Built once per document from the output of extract_author_names. All names are
+    compiled into one trie-shaped regex followed by the possessive/verb suffix, so the
+    cost of a scan grows with the length of the text rather than with text length
+    times the number of authors.
+    """
+
+    def __init__(self, author_names):
+        # Names match case-insensitively; prefer the first spelling in sorted order
+        self.canonical = {}
+        for name in sorted(author_names):
+            self.canonical.setdefault(name.lower(), name)
+
+        self.regex = None
+        if self.canonical:
+            verbs = '|'.join(AUTHOR_REFERENCE_VERBS)
+            self.regex = re.compile(
+                r"\b(" + _trie_pattern(self.canonical) + r")(?:'s\b|\s+(?:" + verbs + r")\b)",
+                re.IGNORECASE
+            )
+
+    def find_mentions(self, text):
+        """
+        Find every author mention in the text.
+
+        Args:
+            text (str): Text to scan, usually the whole document
+
+        Returns:
+            list: (start, end, author) tuples for the name of each mention, in text order
+        """
+        if self.regex is None:
+            return []
+        return [
+            (match.start(1), match.end(1), self.canonical.get(match.group(1).lower(), match.group(1)))
+            for match in self.regex.finditer(text)
+        ]
+
+
+# ===== AUTHOR NAMES =====
+# Patterns that name the authors cited in a text; every captured group is an author
+AUTHOR_NAME_PATTERNS = [
+    # APA citations: (Smith, 2020)
+    r'\(([\w]+),\s*\d{4}',
+    # APA citations with multiple authors: (Smith et al., 2020)
+    r'\(([\w]+)\s+et\s+al\.',
+    # APA citations with two authors: (Smith and Jones, 2020)
+    r'\(([\w]+)\s+and\s+([\w]+)',
+    # Narrative citations: Smith (2020)
+    r'\b([\w]+)\s+\(\d{4}\)',
+    # MLA citations: (Smith 42)
+    r'\(([\w]+)\s+\d+\)'
+]
+
+
+def _name_scanner(patterns):
+    """
+    Combine the author name patterns into one scanner that finds what each would find on its own.
+
+    Every pattern starts with an opening parenthesis or a word boundary; only that is
+    matched, and the rest of the pattern goes into a lookahead, so the matches of
+    different patterns can still overlap as they do when each pattern runs separately.
+    This relies on no two patterns matching at the same position, and no pattern
+    matching again inside one of its own matches, which holds for the ones above.
+    The word boundary branch comes first, as nearly every position fails it at once.
+    """
+    branches = {r'\b': [], r'\(': []}
+    for pattern in patterns:
+        branches[pattern[:2]].append(pattern[2:])
+    return re.compile('|'.join(
+        f'{lead}(?={"|".join(rests)})' for lead, rests in branches.items() if rests
+    ))
+
+
+AUTHOR_NAME_SCANNER = _name_scanner(AUTHOR_NAME_PATTERNS)
+
+
+def find_author_names(text):
+    """
+    Find the author names cited in a text, in one pass over it.
+
+    Returns:
+        set: Every name captured by AUTHOR_NAME_PATTERNS
+    """
+    author_names = set()
+    for match in AUTHOR_NAME_SCANNER.finditer(text):
+        author_names.update(name for name in match.groups() if name is not None)
+    return author_names
+
+
+def _bucket_matches(regex, text, starts, ends, anchor_regex=None):
+    """
+    Run a regex once over the whole document and assign each match to a sentence.
+
+    A match belongs to the sentence it starts in, found by bisecting the sentence
+    start offsets, and may run past that sentence's end, which recovers citations
+    that sentence splitting breaks apart. A match that starts in the whitespace
+    between two sentences is re-anchored at the start of the next sentence (with
+    anchor_regex when given, i.e. the pattern without its lead assertion), and
+    matches that cross a paragraph break are dropped.
+
+    Returns:
+        dict: Sentence index to the list of its matches in text order
+    """
+    buckets = {}
+    for match in regex.finditer(text):
+        index = bisect.bisect_right(starts, match.start()) - 1
+        if index < 0 or match.start() >= ends[index]:
+            index += 1
+            if index >= len(starts):
+                continue
+            match = (anchor_regex or regex).match(text, starts[index])
+            if match is None:
+                continue
+        if '\n\n' in match.group(0):
+            continue
+        buckets.setdefault(index, []).append(match)
+    return buckets
+
+
+def scan_document(text, sentence_spans):
+    """
+    Identify the citations of every sentence with one scan of the whole document.
+
+    Each citation pattern runs once over the full text instead of once per sentence,
+    and the matches of each sentence then go through the same rules and deduplication
+    as identify_citations. The author names that extract_author_names would find are
+    collected by one more pass with the combined name scanner, in place of one pass
+    per name pattern.
+
+    Args:
+        text (str): The normalized document text
+        sentence_spans (list): (start, end) offsets of each sentence in the text, in order
+
+    Returns:
+        tuple: (list of (citations, citation count) per sentence, set of author names)
+    """
+    starts = [start for start, _ in sentence_spans]
+    ends = [end for _, end in sentence_spans]
+    text_lower = text.lower()
+
+    # One pass of the combined scanner finds the sentences with any implicit marker;
+    # only those run the ordered family search, bounded to the sentence
+    implicit_sentences = set()
+    for match in IMPLICIT_SCANNER.finditer(text):
+        implicit_sentences.add(bisect.bisect_right(starts, match.start()) - 1)
+        implicit_sentences.add(bisect.bisect_right(starts, match.end() - 1) - 1)
+
+    entry_buckets = [
+        _bucket_matches(entry['regex'], text, starts, ends, entry['anchor_regex'])
+        if _has_required_literals(entry, text, text_lower) else {}
+        for entry in CITATION_REGEXES
+    ]
+    signal_buckets = [_bucket_matches(regex, text, starts, ends) for regex in AUTHOR_SIGNAL_REGEXES]
+
+    results = []
+    for index, (start, end) in enumerate(sentence_spans):
+        implicit_citation = None
+        if index in implicit_sentences:
+            implicit_citation = _implicit_citation(lambda regex: regex.search(text, start, end), start)
+        results.append(_assemble_citations(
+            implicit_citation,
+            [buckets.get(index, ()) for buckets in entry_buckets],
+            [buckets.get(index, ()) for buckets in signal_buckets],
+            start,
+            start
+        ))
+
+    return results, find_author_names(text)
@@ -0,0 +1,49 @@
+"""
+Gunicorn configuration for running app.py with several workers.
+
+The app (and with it the SciBERT model) is loaded once in the master process and
+then forked, so all workers share one read-only copy of the weights instead of
+each loading its own. Start with:
+
+    gunicorn -c gunicorn.conf.py app:app
+
+Each worker's resident/shared/private memory is logged after fork and can be
+read at /model_info.
+"""
+
+import gc
+import os
+import sys
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5001')
+workers = int(os.environ.get('GUNICORN_WORKERS', '4'))
+
+# Threaded workers let concurrent requests in one worker share batched forward passes
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', '8'))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '120'))
+
+# Load the model in the master before forking workers
+preload_app = True
+
+
+def when_ready(server):
+    """Move the weights into shared memory once the preloaded app is ready."""
+    app_module = sys.modules.get('app')
+    if app_module is not None:
+        app_module.rhetorical_classifier.share_memory()
+    # Keep the garbage collector from touching (and so copying) the preloaded objects in every worker
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    """Split the CPU between workers and report this worker's memory."""
+    app_module = sys.modules.get('app')
+    if app_module is None:
+        return
+
+    from scibert_rhetorical_classifier import process_memory_info
+
+    num_threads = max(1, (os.cpu_count() or 1) // workers)
+    app_module.rhetorical_classifier.after_fork(num_threads=num_threads)
+    server.log.info(f"Worker {worker.pid} memory: {process_memory_info()}")
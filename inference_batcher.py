@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Cross-request Micro-batching for the Rhetorical Move Classifier
+
+Concurrent /analyze requests each hand their sentences to a shared queue. A single
+background thread gathers the pending sentences from every in-flight request and
+runs them through the classifier together, flushing when either enough sentences
+are waiting or the oldest request has waited long enough. Each request then gets
+back exactly its own probability vectors.
+"""
+
+import os
+import time
+import threading
+from collections import deque
+
+
+class _PendingRequest:
+    """One caller's sentences waiting for a batched forward pass."""
+
+    def __init__(self, sentences):
+        self.sentences = sentences
+        self.enqueued_at = time.monotonic()
+        self.done = threading.Event()
+        self.results = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    In-process inference queue in front of a RhetoricalMoveClassifier.
+
+    Exposes the same predict_probabilities() call as the classifier, so callers
+    can use either one.
+    """
+
+    def __init__(self, classifier, max_batch_size=64, max_wait_ms=10):
+        self.classifier = classifier
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._pending = deque()
+        self._pending_sentences = 0
+        self._condition = threading.Condition()
+        self._worker = None
+        self._worker_pid = None
+
+        self.stats = {
+            'requests': 0,
+            'sentences': 0,
+            'batches': 0,
+            'shared_batches': 0,
+            'max_batch_sentences': 0
+        }
+
+    def predict_probabilities(self, sentences):
+        """
+        Queue sentences for the next batch and wait for their probability vectors.
+
+        Args:
+            sentences (list): Sentences to classify
+
+        Returns:
+            list: List of numpy probability vectors in input order
+        """
+        if not sentences:
+            return []
+
+        request = _PendingRequest(list(sentences))
+        with self._condition:
+            self._ensure_worker()
+            self._pending.append(request)
+            self._pending_sentences += len(request.sentences)
+            self._condition.notify()
+
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.results
+
+    def _ensure_worker(self):
+        """Start the batching thread in this process (threads do not survive a fork). Caller holds the lock."""
+        if self._worker is not None and self._worker_pid == os.getpid() and self._worker.is_alive():
+            return
+        if self._worker_pid != os.getpid():
+            # Requests queued in the parent before a fork will never be served here
+            self._pending.clear()
+            self._pending_sentences = 0
+        self._worker_pid = os.getpid()
+        self._worker = threading.Thread(target=self._run, name='inference-batcher', daemon=True)
+        self._worker.start()
+
+    def _next_batch(self):
+        """Block until a batch is due, then take whole requests up to max_batch_size sentences."""
+        with self._condition:
+            while True:
+                while not self._pending:
+                    self._condition.wait()
+
+                # Flush when enough sentences are waiting or the oldest request has waited long enough
+                waited = time.monotonic() - self._pending[0].enqueued_at
+                if self._pending_sentences >= self.max_batch_size or waited >= self.max_wait:
+                    break
+                self._condition.wait(self.max_wait - waited)
+
+            batch = [self._pending.popleft()]
+            batch_sentences = len(batch[0].sentences)
+            while self._pending and batch_sentences + len(self._pending[0].sentences) <= self.max_batch_size:
+                request = self._pending.popleft()
+                batch.append(request)
+                batch_sentences += len(request.sentences)
+            self._pending_sentences -= batch_sentences
+
+            return batch, batch_sentences
+
+    def _run(self):
+        """Batching loop run by the background thread."""
+        while True:
+            batch, batch_sentences = self._next_batch()
+
+            sentences = []
+            for request in batch:
+                sentences.extend(request.sentences)
+
+            try:
+                probabilities = self.classifier.predict_probabilities(sentences)
+            except Exception as e:
+                for request in batch:
+                    request.error = e
+                    request.done.set()
+                continue
+
+            # Hand each request back its own slice of the results
+            offset = 0
+            for request in batch:
+                request.results = probabilities[offset:offset+len(request.sentences)]
+                offset += len(request.sentences)
+                request.done.set()
+
+            with self._condition:
+                self.stats['requests'] += len(batch)
+                self.stats['sentences'] += batch_sentences
+                self.stats['batches'] += 1
+                if len(batch) > 1:
+                    self.stats['shared_batches'] += 1
+                self.stats['max_batch_sentences'] = max(self.stats['max_batch_sentences'], batch_sentences)
+
+    def get_stats(self):
+        """Get counters describing how well requests are being batched together."""
+        with self._condition:
+            stats = dict(self.stats)
+            stats['queued_sentences'] = self._pending_sentences
+        stats['avg_batch_sentences'] = round(stats['sentences'] / stats['batches'], 1) if stats['batches'] else 0.0
+        stats['max_batch_size'] = self.max_batch_size
+        stats['max_wait_ms'] = self.max_wait * 1000
+        return stats
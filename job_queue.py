@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Persistent Background Job Queue
+
+Long analyses are submitted as jobs instead of running inside the request. Jobs are
+stored in a local SQLite file, so they survive restarts and every gunicorn worker on
+the machine shares one queue. Each process runs a small pool of worker threads that
+claim queued jobs, report progress while they run, and store the result until the
+client fetches it. A job can be cancelled while it is queued or running.
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+
+
+# Job states
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """Raised from a job's progress callback once the job has been cancelled."""
+
+
+class JobQueue:
+    """
+    SQLite-backed job queue with a pool of background worker threads.
+
+    The handler is called as handler(payload, progress) in a worker thread and returns
+    the job's result; payloads and results must be JSON serializable. The handler
+    should call progress(done, fraction=None) as it goes, which records the progress
+    and raises JobCancelled if the job has been cancelled in the meantime.
+
+    A result is kept until it is fetched and then for retention_seconds; failed and
+    cancelled jobs are kept for retention_seconds after they finish. Results that are
+    never fetched are only deleted if unfetched_retention_seconds is set, that long
+    after the job finished.
+    """
+
+    def __init__(self, path, handler, worker_count=2, poll_interval=1.0, retention_seconds=3600,
+                 progress_interval=0.5, on_purge=None, unfetched_retention_seconds=None):
+        self.path = path
+        self.handler = handler
+        self.worker_count = worker_count
+        self.poll_interval = poll_interval
+        self.retention_seconds = retention_seconds
+        self.unfetched_retention_seconds = unfetched_retention_seconds
+        self.progress_interval = progress_interval
+        self.on_purge = on_purge
+
+        self._local = threading.local()
+        self._condition = threading.Condition()
+        self._workers = []
+        self._workers_pid = None
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._open()
+
+    def _connection(self):
+        """Get the SQLite connection for the current process and thread."""
+        # Connections must not cross a fork, so they are keyed by pid as well as thread
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            # Autocommit mode; claiming a job uses an explicit transaction
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _open(self):
+        """Create the jobs table if needed."""
+        connection = self._connection()
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            'id TEXT PRIMARY KEY, '
+            'status TEXT NOT NULL, '
+            'payload TEXT NOT NULL, '
+            'result TEXT, '
+            'error TEXT, '
+            'progress INTEGER NOT NULL DEFAULT 0, '
+            'progress_fraction REAL, '
+            'worker_pid INTEGER, '
+            'created_at REAL NOT NULL, '
+            'started_at REAL, '
+            'finished_at REAL, '
+            'fetched_at REAL)'
+        )
+        connection.execute('CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, created_at)')
+
+    def submit(self, payload, job_id=None):
+        """
+        Queue a new job.
+
+        Args:
+            payload (dict): The job's input, passed to the handler
+            job_id (str): Optional id chosen by the caller (see new_job_id)
+
+        Returns:
+            str: The job id
+        """
+        job_id = job_id or new_job_id()
+        self._connection().execute(
+            'INSERT INTO jobs (id, status, payload, created_at) VALUES (?, ?, ?, ?)',
+            (job_id, QUEUED, json.dumps(payload), time.time())
+        )
+        self._ensure_workers()
+        with self._condition:
+            self._condition.notify()
+        return job_id
+
+    def status(self, job_id):
+        """
+        Get a job's state and progress.
+
+        Args:
+            job_id (str): The job id
+
+        Returns:
+            dict: The job's status fields, or None if there is no such job
+        """
+        self._ensure_workers()
+        row = self._connection().execute(
+            'SELECT id, status, error, progress, progress_fraction, created_at, started_at, finished_at '
+            'FROM jobs WHERE id = ?', (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        status = dict(row)
+        if status['status'] == QUEUED:
+            status['queue_position'] = self._connection().execute(
+                'SELECT COUNT(*) FROM jobs WHERE status = ? AND created_at <= ?', (QUEUED, status['created_at'])
+            ).fetchone()[0]
+        return status
+
+    def result(self, job_id):
+        """
+        Fetch a job's result.
+
+        A result is kept until it is first fetched and for retention_seconds afterwards,
+        so a retried request still finds it.
+
+        Args:
+            job_id (str): The job id
+
+        Returns:
+            tuple: (status dict, result) where result is None unless the job is done,
+                   or (None, None) if there is no such job
+        """
+        status = self.status(job_id)
+        if status is None or status['status'] != DONE:
+            return status, None
+        connection = self._connection()
+        row = connection.execute('SELECT result FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None, None
+        connection.execute('UPDATE jobs SET fetched_at = ? WHERE id = ? AND fetched_at IS NULL', (time.time(), job_id))
+        return status, json.loads(row['result'])
+
+    def cancel(self, job_id):
+        """
+        Cancel a queued or running job. A running job stops at its next progress report.
+
+        Args:
+            job_id (str): The job id
+
+        Returns:
+            bool: True if the job was cancelled, False if it had already finished or does not exist
+        """
+        cancelled = self._connection().execute(
+            'UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status IN (?, ?)',
+            (CANCELLED, time.time(), job_id, QUEUED, RUNNING)
+        ).rowcount
+        return cancelled > 0
+
+    def get_stats(self):
+        """Get the number of jobs in each state."""
+        rows = self._connection().execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall()
+        stats = {state: 0 for state in (QUEUED, RUNNING) + FINISHED_STATES}
+        for state, count in rows:
+            stats[state] = count
+        stats['workers'] = self.worker_count
+        return stats
+
+    def _ensure_workers(self):
+        """Start the worker threads in this process (threads do not survive a fork)."""
+        with self._condition:
+            if self._workers_pid == os.getpid() and all(worker.is_alive() for worker in self._workers):
+                return
+            if self._workers_pid != os.getpid():
+                self._requeue_orphans()
+            self._workers_pid = os.getpid()
+            self._workers = [worker for worker in self._workers if worker.is_alive()]
+            while len(self._workers) < self.worker_count:
+                worker = threading.Thread(target=self._run, name=f'job-worker-{len(self._workers)}', daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def _requeue_orphans(self):
+        """Put back jobs left running by a process that no longer exists."""
+        connection = self._connection()
+        rows = connection.execute('SELECT id, worker_pid FROM jobs WHERE status = ?', (RUNNING,)).fetchall()
+        for job_id, worker_pid in rows:
+            # Our own pid can only be a leftover from an earlier process that had the same pid
+            if worker_pid is not None and worker_pid != os.getpid() and _process_alive(worker_pid):
+                continue
+            connection.execute(
+                'UPDATE jobs SET status = ?, worker_pid = NULL, started_at = NULL WHERE id = ? AND status = ?',
+                (QUEUED, job_id, RUNNING)
+            )
+            print(f"Requeued job {job_id} left running by process {worker_pid}")
+
+    def _claim(self):
+        """Mark the oldest queued job as running in this process and return (id, payload), or None."""
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                'SELECT id, payload FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1', (QUEUED,)
+            ).fetchone()
+            if row is not None:
+                connection.execute(
+                    'UPDATE jobs SET status = ?, worker_pid = ?, started_at = ? WHERE id = ?',
+                    (RUNNING, os.getpid(), time.time(), row['id'])
+                )
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        if row is None:
+            return None
+        return row['id'], json.loads(row['payload'])
+
+    def _purge(self):
+        """
+        Delete results fetched more than retention_seconds ago, failed and cancelled jobs
+        that finished more than retention_seconds ago and, if unfetched_retention_seconds
+        is set, results nobody fetched within that time.
+        """
+        connection = self._connection()
+        now = time.time()
+        cutoff = now - self.retention_seconds
+        # Without an unfetched retention, a result waits for its client however long it takes
+        unfetched_cutoff = now - self.unfetched_retention_seconds if self.unfetched_retention_seconds else None
+        rows = connection.execute(
+            'SELECT id FROM jobs WHERE (status IN (?, ?) AND finished_at < ?) '
+            'OR (status = ? AND (fetched_at < ? OR (fetched_at IS NULL AND finished_at < ?)))',
+            (FAILED, CANCELLED, cutoff, DONE, cutoff, unfetched_cutoff)
+        ).fetchall()
+        for row in rows:
+            connection.execute('DELETE FROM jobs WHERE id = ?', (row['id'],))
+            # Let the owner clean up anything else the job left behind (e.g. uploaded files)
+            if self.on_purge is not None:
+                self.on_purge(row['id'])
+
+    def _run(self):
+        """Worker loop run by each background thread."""
+        while True:
+            try:
+                job = self._claim()
+            except sqlite3.Error as e:
+                print(f"✗ Job queue error: {e}")
+                job = None
+
+            if job is None:
+                # Jobs may also be submitted by other processes, so poll as well as wait for a notify
+                try:
+                    self._purge()
+                except sqlite3.Error:
+                    pass
+                with self._condition:
+                    self._condition.wait(self.poll_interval)
+                continue
+
+            self._execute(*job)
+
+    def _execute(self, job_id, payload):
+        """Run one claimed job and store its outcome."""
+        connection = self._connection()
+        last_report = 0.0
+        latest_done = 0
+
+        def progress(done, fraction=None):
+            # Record progress at most every progress_interval seconds, and stop if the job was cancelled
+            nonlocal last_report, latest_done
+            latest_done = done
+            now = time.monotonic()
+            if now - last_report < self.progress_interval:
+                return
+            last_report = now
+            updated = connection.execute(
+                'UPDATE jobs SET progress = ?, progress_fraction = ? WHERE id = ? AND status = ?',
+                (done, fraction, job_id, RUNNING)
+            ).rowcount
+            if not updated:
+                raise JobCancelled(job_id)
+
+        print(f"Starting job {job_id}")
+        start_time = time.time()
+        try:
+            result = self.handler(payload, progress)
+        except JobCancelled:
+            print(f"Job {job_id} was cancelled")
+            return
+        except Exception as e:
+            print(f"✗ Job {job_id} failed: {e}")
+            connection.execute(
+                'UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ? AND status = ?',
+                (FAILED, str(e), time.time(), job_id, RUNNING)
+            )
+            return
+
+        # A job cancelled after its last progress report keeps its cancelled state
+        connection.execute(
+            'UPDATE jobs SET status = ?, result = ?, progress = ?, progress_fraction = 1.0, finished_at = ? '
+            'WHERE id = ? AND status = ?',
+            (DONE, json.dumps(result), latest_done, time.time(), job_id, RUNNING)
+        )
+        print(f"✓ Job {job_id} finished in {time.time() - start_time:.2f}s")
+
+
+def new_job_id():
+    """Generate an id for a job, e.g. to name its files before it is submitted."""
+    return uuid.uuid4().hex
+
+
+def _process_alive(pid):
+    """Check whether a process with this pid exists."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
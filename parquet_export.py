@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Columnar Export for Analyzed Corpora
+
+Writes analyses as two Parquet tables for corpus-scale work: sentences.parquet with
+one row per sentence, and citations.parquet with one row per citation, which joins
+back to its sentence on (doc_id, sentence_index). Rows are buffered and written out
+as a row group every chunk_rows rows, so memory stays bounded however large the
+corpus is. Needs pyarrow (pip install pyarrow).
+
+Usage:
+    python parquet_export.py results/ --output corpus_parquet/
+
+where results/ is the output directory of batch_analyze.py.
+"""
+
+import os
+import sys
+import json
+import argparse
+
+import pandas as pd
+
+
+# Column names and their Arrow types (pyarrow type factory names), in file order
+SENTENCE_COLUMNS = [
+    ('doc_id', 'string'),
+    ('sentence_index', 'int32'),
+    ('start', 'int64'),
+    ('end', 'int64'),
+    ('sentence', 'string'),
+    ('paragraph_break', 'bool_'),
+    ('has_citation', 'bool_'),
+    ('citation_count', 'int32'),
+    ('citation_style', 'string'),
+    ('rhetorical_move', 'string'),
+    ('confidence', 'float64')
+]
+
+CITATION_COLUMNS = [
+    ('doc_id', 'string'),
+    ('sentence_index', 'int32'),
+    ('citation_index', 'int32'),
+    ('text', 'string'),
+    ('style', 'string'),
+    # Offsets within the sentence, then within the document
+    ('start', 'int32'),
+    ('end', 'int32'),
+    ('doc_start', 'int64'),
+    ('doc_end', 'int64')
+]
+
+
+def check_pyarrow():
+    """
+    Check that pyarrow is installed, so callers can fail before doing any work.
+
+    Raises:
+        ImportError: If pyarrow is missing
+    """
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        raise ImportError("Parquet export needs pyarrow: pip install pyarrow")
+
+
+class _TableWriter:
+    """Buffers the rows of one table and writes them to its Parquet file in row groups."""
+
+    def __init__(self, path, columns, compression):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.path = path
+        self.columns = [name for name, _ in columns]
+        self.schema = pa.schema([(name, getattr(pa, type_name)()) for name, type_name in columns])
+        self.rows = 0
+        self._buffer = {name: [] for name in self.columns}
+        self._pa = pa
+        # Written under a temporary name until closed, as an unfinished Parquet file is unreadable
+        self._writer = pq.ParquetWriter(path + '.tmp', self.schema, compression=compression)
+
+    def __len__(self):
+        return len(self._buffer[self.columns[0]])
+
+    def append(self, row):
+        for name, value in zip(self.columns, row):
+            self._buffer[name].append(value)
+
+    def flush(self):
+        """Write the buffered rows as one row group."""
+        if not len(self):
+            return
+        frame = pd.DataFrame(self._buffer, columns=self.columns)
+        self._writer.write_table(self._pa.Table.from_pandas(frame, schema=self.schema, preserve_index=False))
+        self.rows += len(frame)
+        self._buffer = {name: [] for name in self.columns}
+
+    def close(self):
+        self.flush()
+        self._writer.close()
+        os.replace(self.path + '.tmp', self.path)
+
+
+class ParquetExporter:
+    """
+    Writes analyses to sentences.parquet and citations.parquet in a directory.
+
+    Use as a context manager, or call close() when done; the files only appear
+    once they are complete.
+    """
+
+    def __init__(self, output_dir, chunk_rows=100000, compression='snappy'):
+        check_pyarrow()
+
+        self.output_dir = output_dir
+        self.chunk_rows = chunk_rows
+        self.documents = 0
+
+        os.makedirs(output_dir, exist_ok=True)
+        self.sentences = _TableWriter(os.path.join(output_dir, 'sentences.parquet'), SENTENCE_COLUMNS, compression)
+        self.citations = _TableWriter(os.path.join(output_dir, 'citations.parquet'), CITATION_COLUMNS, compression)
+
+    def add(self, doc_id, analysis):
+        """
+        Add one document's analysis.
+
+        Args:
+            doc_id (str): Identifies the document in both tables
+            analysis (dict): The analysis, as returned by /analyze
+        """
+        for sentence_index, sentence_info in enumerate(analysis['sentence_analysis']):
+            self.sentences.append((
+                doc_id,
+                sentence_index,
+                sentence_info['start'],
+                sentence_info['end'],
+                sentence_info['sentence'],
+                sentence_info['paragraph_break'],
+                sentence_info['has_citation'],
+                sentence_info['citation_count'],
+                sentence_info['citation_style'],
+                sentence_info['rhetorical_move'],
+                sentence_info['confidence']
+            ))
+            for citation_index, citation in enumerate(sentence_info.get('citations_with_styles', [])):
+                self.citations.append((
+                    doc_id,
+                    sentence_index,
+                    citation_index,
+                    citation['text'],
+                    citation['style'],
+                    citation['start'],
+                    citation['end'],
+                    citation['doc_start'],
+                    citation['doc_end']
+                ))
+
+            if len(self.sentences) >= self.chunk_rows:
+                self.sentences.flush()
+            if len(self.citations) >= self.chunk_rows:
+                self.citations.flush()
+        self.documents += 1
+
+    def close(self):
+        """
+        Write the remaining rows and finish both files.
+
+        Returns:
+            dict: Number of documents, sentence rows and citation rows written
+        """
+        self.sentences.close()
+        self.citations.close()
+        return {'documents': self.documents, 'sentences': self.sentences.rows, 'citations': self.citations.rows}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+
+
+def export_results(results_dir, output_dir, chunk_rows=100000):
+    """
+    Export every finished document of a batch_analyze.py run.
+
+    Documents are read one at a time from their result files, in the order of the
+    run's manifest, so memory use does not grow with the corpus.
+
+    Args:
+        results_dir (str): Output directory of batch_analyze.py (with manifest.jsonl)
+        output_dir (str): Where sentences.parquet and citations.parquet are written
+        chunk_rows (int): Rows per Parquet row group
+
+    Returns:
+        dict: Number of documents, sentence rows and citation rows written
+    """
+    # The latest manifest entry of each document decides whether it is done
+    entries = {}
+    with open(os.path.join(results_dir, 'manifest.jsonl'), 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            entries[entry['document']] = entry
+
+    exporter = ParquetExporter(output_dir, chunk_rows)
+    for doc_id, entry in entries.items():
+        if entry['status'] != 'done':
+            continue
+        with open(os.path.join(results_dir, entry['output']), 'r', encoding='utf-8') as f:
+            exporter.add(doc_id, json.load(f))
+    return exporter.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export batch_analyze.py results as Parquet tables")
+    parser.add_argument("results_dir", help="Output directory of batch_analyze.py")
+    parser.add_argument("--output", default="corpus_parquet", help="Directory for sentences.parquet and citations.parquet")
+    parser.add_argument("--chunk-rows", type=int, default=100000, help="Rows per Parquet row group")
+    args = parser.parse_args(argv)
+
+    counts = export_results(args.results_dir, args.output, args.chunk_rows)
+    print(f"✓ Exported {counts['documents']} documents: {counts['sentences']} sentence rows and "
+          f"{counts['citations']} citation rows in {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Two-tier Result Cache
+
+A small cache with a bounded in-memory LRU tier in front of a persistent SQLite tier.
+The SQLite file survives restarts and can be shared by several gunicorn workers on
+the same machine. Every entry belongs to a namespace (for example the identity of the
+model that produced it); entries from other namespaces are never returned and are
+purged when the cache is opened, so changing the model invalidates the cache.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def hash_text(text):
+    """
+    Hash a piece of text after normalizing its whitespace.
+
+    Args:
+        text (str): The text to hash
+
+    Returns:
+        str: Hex digest used as a cache key
+    """
+    normalized = ' '.join(str(text).split())
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """
+    Bounded in-memory LRU cache backed by an optional on-disk SQLite store.
+
+    Values must be JSON serializable.
+    """
+
+    def __init__(self, path=None, namespace='', max_memory_items=10000, max_disk_items=None, table='results'):
+        self.path = path
+        self.namespace = namespace
+        self.max_memory_items = max_memory_items
+        self.max_disk_items = max_disk_items
+        self.table = table
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._writes_since_prune = 0
+
+        self.stats = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'disk_evictions': 0
+        }
+
+        if self.path:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._open_disk()
+
+    def _connection(self):
+        """Get the SQLite connection for the current process and thread."""
+        # Connections must not cross a fork, so they are keyed by pid as well as thread
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _open_disk(self):
+        """Create the table if needed and drop entries from other namespaces."""
+        try:
+            connection = self._connection()
+            with connection:
+                connection.execute(
+                    f'CREATE TABLE IF NOT EXISTS {self.table} ('
+                    'namespace TEXT NOT NULL, '
+                    'key TEXT NOT NULL, '
+                    'value TEXT NOT NULL, '
+                    'created_at REAL NOT NULL, '
+                    'PRIMARY KEY (namespace, key))'
+                )
+                purged = connection.execute(
+                    f'DELETE FROM {self.table} WHERE namespace != ?', (self.namespace,)
+                ).rowcount
+            if purged:
+                print(f"Invalidated {purged} cached results from a previous model")
+        except sqlite3.Error as e:
+            print(f"✗ Could not open result cache at {self.path}: {e}")
+            print("Continuing with the in-memory cache only")
+            self.path = None
+
+    def get(self, key):
+        """Return the cached value for key, or None."""
+        return self.get_many([key]).get(key)
+
+    def put(self, key, value):
+        """Store a value under key in both tiers."""
+        self.put_many({key: value})
+
+    def get_many(self, keys):
+        """
+        Look up several keys at once.
+
+        Args:
+            keys (list): Cache keys
+
+        Returns:
+            dict: Mapping of the keys that were found to their values
+        """
+        found = {}
+        missing = []
+
+        with self._lock:
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+                    self.stats['memory_hits'] += 1
+                else:
+                    missing.append(key)
+
+        if missing and self.path:
+            disk_found = {}
+            try:
+                connection = self._connection()
+                # Stay well below SQLite's limit on bound parameters
+                for start in range(0, len(missing), 500):
+                    chunk = missing[start:start+500]
+                    placeholders = ','.join('?' * len(chunk))
+                    rows = connection.execute(
+                        f'SELECT key, value FROM {self.table} WHERE namespace = ? AND key IN ({placeholders})',
+                        [self.namespace] + chunk
+                    ).fetchall()
+                    for key, value in rows:
+                        disk_found[key] = json.loads(value)
+            except sqlite3.Error as e:
+                print(f"Result cache read error: {e}")
+
+            with self._lock:
+                for key, value in disk_found.items():
+                    self._remember(key, value)
+                    self.stats['disk_hits'] += 1
+            found.update(disk_found)
+
+        with self._lock:
+            self.stats['misses'] += len(keys) - len(found)
+
+        return found
+
+    def put_many(self, items):
+        """
+        Store several values at once.
+
+        Args:
+            items (dict): Mapping of cache keys to values
+        """
+        if not items:
+            return
+
+        with self._lock:
+            for key, value in items.items():
+                self._remember(key, value)
+
+        if self.path:
+            now = time.time()
+            try:
+                connection = self._connection()
+                with connection:
+                    connection.executemany(
+                        f'INSERT OR REPLACE INTO {self.table} (namespace, key, value, created_at) VALUES (?, ?, ?, ?)',
+                        [(self.namespace, key, json.dumps(value), now) for key, value in items.items()]
+                    )
+                self._writes_since_prune += len(items)
+                if self.max_disk_items and self._writes_since_prune >= max(1, self.max_disk_items // 10):
+                    self._prune_disk()
+            except sqlite3.Error as e:
+                print(f"Result cache write error: {e}")
+
+    def _remember(self, key, value):
+        """Insert into the LRU tier, evicting the least recently used entries. Caller holds the lock."""
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def _prune_disk(self):
+        """Drop the oldest disk entries beyond max_disk_items."""
+        self._writes_since_prune = 0
+        connection = self._connection()
+        with connection:
+            removed = connection.execute(
+                f'DELETE FROM {self.table} WHERE rowid IN ('
+                f'SELECT rowid FROM {self.table} ORDER BY created_at DESC LIMIT -1 OFFSET ?)',
+                (self.max_disk_items,)
+            ).rowcount
+        with self._lock:
+            self.stats['disk_evictions'] += removed
+
+    def clear(self):
+        """Remove every entry in this namespace from both tiers."""
+        with self._lock:
+            self._memory.clear()
+        if self.path:
+            connection = self._connection()
+            with connection:
+                connection.execute(f'DELETE FROM {self.table} WHERE namespace = ?', (self.namespace,))
+
+    def get_stats(self):
+        """Get hit/miss/eviction counters and tier sizes."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['memory_items'] = len(self._memory)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['memory_hits'] + stats['disk_hits']) / lookups, 3) if lookups else 0.0
+        stats['disk_path'] = self.path
+        return stats
@@ -10,9 +10,12 @@ as a drop-in replacement for the existing TF-IDF classifier in the SourceMapper
 
 import os
 import pickle
+import hashlib
+import threading
 import torch
 import numpy as np
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
+from result_cache import ResultCache, hash_text
 
 # Define the rhetorical move categories
 RHETORICAL_MOVES = {
@@ -22,16 +25,95 @@ RHETORICAL_MOVES = {
     3: "None"          # No citation or rhetorical move
 }
 
+# Index of the "None" class in the probability vector
+NONE_CLASS = 3
+
+# Padded-token budget for one batched forward pass (sentences x longest sentence)
+MAX_BATCH_TOKENS = 4096
+
+# Supported inference backends
+BACKENDS = ("torch", "onnx")
+
+# Supported numeric precisions: full fp32, dynamically quantized int8 linear layers, bfloat16
+PRECISIONS = ("fp32", "int8", "bf16")
+
+# Subdirectory of the model directory that holds the exported ONNX graph
+ONNX_SUBDIR = "onnx"
+
+# File in the model directory that holds the fast TF-IDF tier used by the cascade
+FAST_TIER_FILE = "fast_tier.pkl"
+
+# Sentences used to check that an alternative backend matches the PyTorch outputs
+PARITY_CHECK_SENTENCES = [
+    "According to Smith (2019), climate change is a major concern.",
+    "The researchers found significant correlations in their data.",
+    "However, this approach fails to consider important factors.",
+    "This is a sentence without any citations."
+]
+
+# Largest allowed difference between backend probabilities
+PARITY_TOLERANCE = 1e-4
+
+# Probability vectors used when the model cannot score a sentence.
+# The fallback vector decodes to ("Transforming", 0.5) with or without the "None" class.
+FALLBACK_PROBABILITIES = np.array([0.25, 0.5, 0.25, 0.0], dtype=np.float32)
+EMPTY_SENTENCE_PROBABILITIES = np.array([0.0, 0.0, 0.0, 1.0], dtype=np.float32)
+
+def move_from_probabilities(probabilities, exclude_none=False):
+    """
+    Decode a probability vector from the classifier into a rhetorical move.
+    
+    Args:
+        probabilities (array): Softmax probabilities over RHETORICAL_MOVES
+        exclude_none (bool): Drop the "None" class and renormalize over the 3 rhetorical moves
+        
+    Returns:
+        tuple: (predicted_move, confidence_score)
+    """
+    if exclude_none:
+        # Exclude the "None" class (index 3) and renormalize
+        rhetorical_probs = probabilities[:NONE_CLASS]
+        total = rhetorical_probs.sum()
+        if total <= 0:
+            return "Transforming", 0.5
+        probabilities = rhetorical_probs / total
+    
+    predicted_class = int(np.argmax(probabilities))
+    confidence = float(probabilities[predicted_class])
+    
+    # Map to rhetorical move name
+    predicted_move = RHETORICAL_MOVES.get(predicted_class, "Transforming")
+    return predicted_move, confidence
+
+def bf16_supported(device):
+    """Whether bfloat16 inference is natively supported on the given torch device."""
+    if device.type == "cuda":
+        return torch.cuda.is_bf16_supported()
+    # Without native bf16 instructions the CPU emulates it, which is slower than fp32
+    is_supported = getattr(torch.cpu, "_is_avx512_bf16_supported", None)
+    is_amx_supported = getattr(torch.cpu, "_is_amx_tile_supported", None)
+    return bool((is_supported and is_supported()) or (is_amx_supported and is_amx_supported()))
+
 class RhetoricalMoveClassifier:
     """
     SciBERT-based rhetorical move classifier that maintains compatibility
     with the existing SourceMapper interface.
     """
     
-    def __init__(self, model_path="bert_comparison_results/scibert/final_model/"):
+    def __init__(self, model_path="bert_comparison_results/scibert/final_model/", cache_path=None, cache_size=10000,
+                 backend="torch", precision="fp32", cascade_threshold=None):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown inference backend '{backend}', expected one of {BACKENDS}")
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision '{precision}', expected one of {PRECISIONS}")
+        
         self.model_path = model_path
+        self.backend = backend
+        self.precision = precision
         self.tokenizer = None
         self.model = None
+        self.onnx_session = None
+        self.onnx_path = None
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         
         # Initialize empty attributes to avoid any inheritance issues
@@ -39,7 +121,52 @@ class RhetoricalMoveClassifier:
         self.vectorizer = None
         self.ensemble = None
         
+        # Cascade: sentences the fast TF-IDF tier scores at or above this confidence skip SciBERT
+        self.cascade_threshold = cascade_threshold
+        self.tier_counts = {'cache': 0, 'fast': 0, 'scibert': 0}
+        self._tier_lock = threading.Lock()
+        
         self.load_model()
+        if self.cascade_threshold is not None:
+            self.load_fast_tier()
+        
+        # Sentence prediction cache, keyed by normalized sentence hash within the model's identity
+        self.cache = None
+        if self.is_ready() and (cache_path or cache_size):
+            self.cache = ResultCache(
+                path=cache_path,
+                namespace=self.model_identity(),
+                max_memory_items=cache_size,
+                table='sentence_predictions'
+            )
+    
+    def model_identity(self):
+        """
+        Fingerprint the model directory so cached predictions are tied to the exact weights.
+        
+        Returns:
+            str: Hex digest over the model path, the backend, the precision and the name, size
+                 and mtime of every file in the model directory (derived exports are skipped)
+        """
+        model_dir = os.path.abspath(self.model_path)
+        fingerprint = hashlib.sha256(f"{model_dir}|{self.backend}|{self.precision}".encode('utf-8'))
+        
+        for root, dirs, files in os.walk(model_dir):
+            if root == model_dir:
+                if ONNX_SUBDIR in dirs:
+                    dirs.remove(ONNX_SUBDIR)
+                files = [name for name in files if name != FAST_TIER_FILE]
+            dirs.sort()
+            for name in sorted(files):
+                file_path = os.path.join(root, name)
+                try:
+                    stat = os.stat(file_path)
+                except OSError:
+                    continue
+                relative_path = os.path.relpath(file_path, model_dir)
+                fingerprint.update(f"{relative_path}:{stat.st_size}:{stat.st_mtime_ns}".encode('utf-8'))
+        
+        return fingerprint.hexdigest()
     
     def load_model(self):
         """Load the fine-tuned SciBERT model."""
@@ -59,170 +186,585 @@ class RhetoricalMoveClassifier:
             print("Falling back to dummy predictions")
             self.model = None
             self.tokenizer = None
+            return
+        
+        if self.backend == "onnx":
+            self.load_onnx_backend()
+        else:
+            self.apply_precision()
     
-    def predict_rhetorical_move(self, sentence):
+    def apply_precision(self):
         """
-        Predict the rhetorical move for a sentence.
+        Convert the loaded PyTorch model to the requested precision.
+        
+        int8 dynamically quantizes the Linear layers (CPU only); bf16 casts the weights
+        to bfloat16 when the hardware supports it. Unsupported modes fall back to fp32.
+        """
+        if self.precision == "int8":
+            if self.device.type != "cpu":
+                print("✗ int8 dynamic quantization only runs on CPU, using fp32")
+                self.precision = "fp32"
+                return
+            self.model = torch.ao.quantization.quantize_dynamic(
+                self.model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+            print("✓ Quantized SciBERT linear layers to int8")
+        
+        elif self.precision == "bf16":
+            if not bf16_supported(self.device):
+                print(f"✗ bfloat16 is not supported on this {self.device.type.upper()}, using fp32")
+                self.precision = "fp32"
+                return
+            self.model = self.model.to(torch.bfloat16)
+            print("✓ Converted SciBERT weights to bfloat16")
+    
+    def is_ready(self):
+        """Whether a tokenizer and an inference backend are available."""
+        return self.tokenizer is not None and (self.model is not None or self.onnx_session is not None)
+    
+    def _load_reference_model(self):
+        """Load a fresh fp32 PyTorch copy of the model, e.g. as a parity reference."""
+        model = AutoModelForSequenceClassification.from_pretrained(self.model_path)
+        model.to(self.device)
+        model.eval()
+        return model
+    
+    def export_onnx(self, onnx_path=None):
+        """
+        Export the fine-tuned PyTorch model to an ONNX graph.
         
         Args:
-            sentence (str): The sentence to classify
+            onnx_path (str): Where to write the graph (defaults to <model_path>/onnx/model.onnx)
             
         Returns:
-            tuple: (predicted_move, confidence_score)
+            str: Path of the exported graph
         """
-        if self.model is None or self.tokenizer is None:
-            # Fallback prediction if model failed to load
-            return "Transforming", 0.5
+        if onnx_path is None:
+            onnx_path = os.path.join(self.model_path, ONNX_SUBDIR, "model.onnx")
+        os.makedirs(os.path.dirname(onnx_path), exist_ok=True)
         
-        try:
-            # Preprocess the sentence
-            sentence = str(sentence).strip()
-            if not sentence:
-                return "None", 1.0
+        model = self.model if self.model is not None else self._load_reference_model()
+        model = model.to("cpu")
+        
+        class LogitsOnly(torch.nn.Module):
+            """Wrap the classifier so the graph returns a plain logits tensor."""
+            def __init__(self, wrapped):
+                super().__init__()
+                self.wrapped = wrapped
             
-            # Tokenize
-            inputs = self.tokenizer(
-                sentence,
-                return_tensors="pt",
-                padding=True,
-                truncation=True,
-                max_length=512
+            def forward(self, *inputs):
+                return self.wrapped(**dict(zip(input_names, inputs))).logits
+        
+        input_names = list(self.tokenizer.model_input_names)
+        sample = self.tokenizer(PARITY_CHECK_SENTENCES[:2], return_tensors="pt", padding=True)
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["logits"] = {0: "batch"}
+        
+        print(f"Exporting SciBERT model to {onnx_path}")
+        with torch.no_grad():
+            torch.onnx.export(
+                LogitsOnly(model),
+                tuple(sample[name] for name in input_names),
+                onnx_path,
+                input_names=input_names,
+                output_names=["logits"],
+                dynamic_axes=dynamic_axes,
+                opset_version=17,
+                dynamo=False
             )
+        
+        if self.model is not None:
+            self.model.to(self.device)
+        return onnx_path
+    
+    def load_onnx_backend(self):
+        """
+        Serve predictions through onnxruntime on CPU.
+        
+        Exports the model on first use, then checks the ONNX outputs against PyTorch.
+        Stays on the PyTorch backend if onnxruntime is missing or the check fails.
+        """
+        try:
+            import onnxruntime
+        except ImportError:
+            print("✗ onnxruntime is not installed, using the PyTorch backend")
+            self.backend = "torch"
+            return
+        
+        try:
+            onnx_path = os.path.join(self.model_path, ONNX_SUBDIR, "model.onnx")
+            if not os.path.exists(onnx_path):
+                self.export_onnx(onnx_path)
             
-            # Move to device
-            inputs = {k: v.to(self.device) for k, v in inputs.items()}
-            
-            # Get predictions
-            with torch.no_grad():
-                outputs = self.model(**inputs)
-                logits = outputs.logits
-                
-                # Apply softmax to get probabilities
-                probabilities = torch.softmax(logits, dim=-1)
+            self.onnx_session = self._create_onnx_session(onnx_path)
+        except Exception as e:
+            print(f"✗ Error loading ONNX backend: {e}")
+            print("Using the PyTorch backend")
+            self.onnx_session = None
+            self.backend = "torch"
+            self.apply_precision()
+            return
+        
+        # Check the fp32 export itself; reduced precision is measured with measure_precision_drift
+        parity = self.check_backend_parity()
+        if not parity['passed']:
+            print(f"✗ ONNX outputs differ from PyTorch ({parity}), using the PyTorch backend")
+            self.onnx_session = None
+            self.backend = "torch"
+            self.apply_precision()
+            return
+        
+        if self.precision == "int8":
+            try:
+                from onnxruntime.quantization import quantize_dynamic, QuantType
                 
-                # Get predicted class and confidence
-                predicted_class = torch.argmax(probabilities, dim=-1).item()
-                confidence = torch.max(probabilities).item()
-            
-            # Map to rhetorical move name
-            predicted_move = RHETORICAL_MOVES.get(predicted_class, "Transforming")
+                int8_path = os.path.join(self.model_path, ONNX_SUBDIR, "model.int8.onnx")
+                if not os.path.exists(int8_path):
+                    quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QInt8)
+                self.onnx_session = self._create_onnx_session(int8_path)
+                print("✓ Quantized the ONNX graph to int8")
+            except Exception as e:
+                print(f"✗ Error quantizing the ONNX graph: {e}, using fp32")
+                self.precision = "fp32"
+        elif self.precision == "bf16":
+            print("✗ bfloat16 is not supported by the ONNX backend, using fp32")
+            self.precision = "fp32"
+        
+        # The PyTorch weights are no longer needed for inference
+        self.model = None
+        print(f"✓ ONNX Runtime backend ready (max difference from PyTorch: {parity['max_abs_diff']:.2e})")
+    
+    def _create_onnx_session(self, onnx_path):
+        """Open an optimized CPU ONNX Runtime session for a graph file."""
+        import onnxruntime
+        
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.onnx_path = onnx_path
+        return onnxruntime.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+    
+    def share_memory(self):
+        """
+        Prepare the loaded weights to be shared read-only by forked worker processes.
+        
+        Call this in the parent before forking (e.g. gunicorn with preload_app). The
+        PyTorch parameters are moved into shared memory, so every worker maps the same
+        physical pages instead of holding its own copy.
+        """
+        if self.model is not None:
+            self.model.share_memory()
+            print("✓ SciBERT weights moved to shared memory")
+    
+    def after_fork(self, num_threads=None):
+        """
+        Re-create per-process state in a worker forked from a preloaded parent.
+        
+        Args:
+            num_threads (int): Intra-op threads for this worker, so workers do not oversubscribe the CPU
+        """
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        
+        # ONNX Runtime thread pools do not survive fork, so each worker opens its own session
+        if self.onnx_session is not None:
+            self.onnx_session = self._create_onnx_session(self.onnx_path)
+    
+    def check_backend_parity(self, sentences=None, tolerance=PARITY_TOLERANCE):
+        """
+        Compare the active backend's probabilities with the fp32 PyTorch model.
+        
+        Args:
+            sentences (list): Sentences to compare on (defaults to PARITY_CHECK_SENTENCES)
+            tolerance (float): Largest allowed absolute difference in any probability
             
-            return predicted_move, confidence
+        Returns:
+            dict: max_abs_diff, number of sentences whose (move, no-None move) decisions differ, passed
+        """
+        if sentences is None:
+            sentences = PARITY_CHECK_SENTENCES
+        sentences = [str(sentence).strip() for sentence in sentences if str(sentence).strip()]
+        
+        reference = self._load_reference_model()
+        candidate = self._forward_probabilities(sentences)
+        expected = self._forward_probabilities(sentences, model=reference)
+        
+        max_abs_diff = 0.0
+        mismatched_moves = 0
+        for got, want in zip(candidate, expected):
+            max_abs_diff = max(max_abs_diff, float(np.max(np.abs(got - want))))
+            for exclude_none in (False, True):
+                if move_from_probabilities(got, exclude_none)[0] != move_from_probabilities(want, exclude_none)[0]:
+                    mismatched_moves += 1
+                    break
+        
+        return {
+            'sentences': len(sentences),
+            'max_abs_diff': max_abs_diff,
+            'mismatched_moves': mismatched_moves,
+            'passed': max_abs_diff <= tolerance and mismatched_moves == 0
+        }
+    
+    def measure_precision_drift(self, sentences, labels=None):
+        """
+        Measure how far the active precision/backend drifts from the fp32 PyTorch model.
+        
+        Args:
+            sentences (list): Sample sentences
+            labels (list): Optional gold rhetorical moves (names or class indices) for the sentences
             
+        Returns:
+            dict: Agreement with fp32, probability differences, timings and, when labels
+                  are given, the accuracy of both models
+        """
+        import time
+        
+        pairs = [(str(sentence).strip(), label) for sentence, label in
+                 zip(sentences, labels if labels is not None else [None] * len(sentences))]
+        pairs = [(sentence, label) for sentence, label in pairs if sentence]
+        sentences = [sentence for sentence, _ in pairs]
+        if not sentences or not self.is_ready():
+            return {'sentences': 0}
+        
+        start = time.perf_counter()
+        candidate = self._forward_probabilities(sentences)
+        candidate_seconds = time.perf_counter() - start
+        
+        reference = self._load_reference_model()
+        start = time.perf_counter()
+        expected = self._forward_probabilities(sentences, model=reference)
+        reference_seconds = time.perf_counter() - start
+        
+        diffs = [np.abs(got - want) for got, want in zip(candidate, expected)]
+        candidate_moves = [move_from_probabilities(p)[0] for p in candidate]
+        reference_moves = [move_from_probabilities(p)[0] for p in expected]
+        candidate_no_none = [move_from_probabilities(p, exclude_none=True)[0] for p in candidate]
+        reference_no_none = [move_from_probabilities(p, exclude_none=True)[0] for p in expected]
+        
+        report = {
+            'precision': self.precision,
+            'backend': self.backend,
+            'sentences': len(sentences),
+            'agreement': sum(a == b for a, b in zip(candidate_moves, reference_moves)) / len(sentences),
+            'agreement_no_none': sum(a == b for a, b in zip(candidate_no_none, reference_no_none)) / len(sentences),
+            'max_abs_diff': float(max(d.max() for d in diffs)),
+            'mean_abs_diff': float(np.mean([d.mean() for d in diffs])),
+            'ms_per_sentence': 1000 * candidate_seconds / len(sentences),
+            'fp32_ms_per_sentence': 1000 * reference_seconds / len(sentences)
+        }
+        
+        if labels is not None:
+            gold = [RHETORICAL_MOVES.get(label, label) for _, label in pairs]
+            report['accuracy'] = sum(a == b for a, b in zip(candidate_moves, gold)) / len(gold)
+            report['fp32_accuracy'] = sum(a == b for a, b in zip(reference_moves, gold)) / len(gold)
+        
+        return report
+    
+    def load_fast_tier(self):
+        """Load the fast TF-IDF + linear tier used by the cascade, if it has been trained."""
+        fast_tier_path = os.path.join(self.model_path, FAST_TIER_FILE)
+        if not os.path.exists(fast_tier_path):
+            print(f"✗ No fast tier found at {fast_tier_path}, every sentence will go to SciBERT")
+            print("  Train one with RhetoricalMoveClassifier.train_fast_tier()")
+            return False
+        
+        try:
+            with open(fast_tier_path, 'rb') as f:
+                fast_tier = pickle.load(f)
+            self.vectorizer = fast_tier['vectorizer']
+            self.models['fast_tier'] = fast_tier['model']
+            print(f"✓ Fast tier loaded (cascade threshold {self.cascade_threshold})")
+            return True
         except Exception as e:
-            print(f"SciBERT prediction error: {e}")
-            print(f"Sentence length: {len(sentence)}")
-            print(f"Device: {self.device}")
-            import traceback
-            traceback.print_exc()
-            # Fallback prediction
-            return "Transforming", 0.5
+            print(f"✗ Error loading fast tier: {e}")
+            self.vectorizer = None
+            self.models.pop('fast_tier', None)
+            return False
+    
+    def train_fast_tier(self, sentences, labels=None, save=True):
+        """
+        Train the fast TF-IDF + logistic regression tier.
+        
+        Without labels the tier is distilled from SciBERT: it learns to reproduce the
+        transformer's own predictions on the given sentences.
+        
+        Args:
+            sentences (list): Training sentences
+            labels (list): Optional gold rhetorical moves (names or class indices)
+            save (bool): Write the tier to <model_path>/fast_tier.pkl
+            
+        Returns:
+            dict: Number of training sentences and the tier's agreement with its training labels
+        """
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.linear_model import LogisticRegression
+        
+        sentences = [str(sentence).strip() for sentence in sentences]
+        if labels is None:
+            if not self.is_ready():
+                raise RuntimeError("SciBERT is not loaded, so there is nothing to distill from")
+            labels = [int(np.argmax(p)) for p in self._forward_probabilities([s for s in sentences if s])]
+            sentences = [s for s in sentences if s]
+        else:
+            move_ids = {move: class_id for class_id, move in RHETORICAL_MOVES.items()}
+            labels = [move_ids.get(label, label) for label in labels]
+        
+        if len(set(labels)) < 2:
+            raise ValueError("The fast tier needs training examples of at least two rhetorical moves")
+        
+        vectorizer = TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True, min_df=1)
+        features = vectorizer.fit_transform(sentences)
+        model = LogisticRegression(max_iter=1000)
+        model.fit(features, labels)
+        
+        self.vectorizer = vectorizer
+        self.models['fast_tier'] = model
+        
+        if save:
+            with open(os.path.join(self.model_path, FAST_TIER_FILE), 'wb') as f:
+                pickle.dump({'vectorizer': vectorizer, 'model': model}, f)
+        
+        return {
+            'sentences': len(sentences),
+            'training_agreement': float(model.score(features, labels))
+        }
+    
+    def _fast_tier_probabilities(self, sentences):
+        """Score sentences with the fast tier, as probability vectors over RHETORICAL_MOVES."""
+        model = self.models['fast_tier']
+        scores = model.predict_proba(self.vectorizer.transform(sentences))
+        
+        # The tier may not have seen every class during training
+        vectors = np.zeros((len(sentences), len(RHETORICAL_MOVES)), dtype=np.float32)
+        for column, class_id in enumerate(model.classes_):
+            vectors[:, int(class_id)] = scores[:, column]
+        return list(vectors)
+    
+    def _count_tier(self, tier, count):
+        """Record how many sentences a cascade tier handled."""
+        with self._tier_lock:
+            self.tier_counts[tier] += count
+    
+    def get_cascade_stats(self):
+        """Get the number and fraction of sentences handled by the cache, the fast tier and SciBERT."""
+        with self._tier_lock:
+            counts = dict(self.tier_counts)
+        total = sum(counts.values())
+        return {
+            'enabled': self.cascade_threshold is not None and 'fast_tier' in self.models,
+            'threshold': self.cascade_threshold,
+            'counts': counts,
+            'fractions': {tier: round(count / total, 3) if total else 0.0 for tier, count in counts.items()}
+        }
+    
+    def predict_rhetorical_move(self, sentence):
+        """
+        Predict the rhetorical move for a sentence.
+        
+        Args:
+            sentence (str): The sentence to classify
+            
+        Returns:
+            tuple: (predicted_move, confidence_score)
+        """
+        return move_from_probabilities(self.predict_probabilities([sentence])[0])
     
     def predict_rhetorical_move_no_none(self, sentence):
         """
         Predict rhetorical move excluding 'None' class - forces prediction among the 3 rhetorical moves.
+        
+        Callers that already hold the probability vector for the sentence should use
+        move_from_probabilities(probabilities, exclude_none=True) instead of running the model again.
         """
-        try:
-            # Tokenize the sentence
-            inputs = self.tokenizer(
-                sentence, 
-                return_tensors="pt", 
-                padding=True, 
-                truncation=True, 
-                max_length=512
-            )
-            
-            # Move to device
-            inputs = {k: v.to(self.device) for k, v in inputs.items()}
-            
-            # Get predictions
-            with torch.no_grad():
-                outputs = self.model(**inputs)
-                logits = outputs.logits
-                
-                # Apply softmax to get probabilities
-                probabilities = torch.softmax(logits, dim=-1)
-                
-                # Exclude the "None" class (index 3) and renormalize
-                rhetorical_probs = probabilities[0][:3]  # Only first 3 classes
-                rhetorical_probs = rhetorical_probs / rhetorical_probs.sum()  # Renormalize
-                
-                # Get predicted class and confidence from the 3 rhetorical moves
-                predicted_class = torch.argmax(rhetorical_probs).item()
-                confidence = torch.max(rhetorical_probs).item()
-            
-            # Map to rhetorical move name (0=Reporting, 1=Transforming, 2=Evaluating)
-            predicted_move = RHETORICAL_MOVES.get(predicted_class, "Transforming")
-            
-            return predicted_move, confidence
-            
-        except Exception as e:
-            print(f"SciBERT no-none prediction error: {e}")
-            import traceback
-            traceback.print_exc()
-            # Fallback prediction
-            return "Transforming", 0.5
+        return move_from_probabilities(self.predict_probabilities([sentence])[0], exclude_none=True)
     
-    def predict_batch(self, sentences, batch_size=16):
+    def predict_batch(self, sentences, batch_size=None, max_tokens=MAX_BATCH_TOKENS):
         """
         Predict rhetorical moves for a batch of sentences.
         
         Args:
             sentences (list): List of sentences to classify
-            batch_size (int): Batch size for processing
+            batch_size (int): Optional cap on the number of sentences per batch
+            max_tokens (int): Token budget per batch (batch size x padded length)
             
         Returns:
             list: List of (predicted_move, confidence_score) tuples
         """
-        if self.model is None or self.tokenizer is None:
+        probabilities = self.predict_probabilities(sentences, batch_size, max_tokens)
+        return [move_from_probabilities(p) for p in probabilities]
+    
+    def predict_probabilities(self, sentences, batch_size=None, max_tokens=MAX_BATCH_TOKENS):
+        """
+        Get the full probability vector over RHETORICAL_MOVES for each sentence.
+        
+        One forward pass gives both the 4-class prediction and the renormalized
+        3-class ("no None") prediction via move_from_probabilities.
+        
+        Sentences are sorted by tokenized length and packed into batches that stay
+        within a padded token budget, so one long sentence does not make a whole
+        batch of short ones pay for its attention. Results come back in input order.
+        
+        Args:
+            sentences (list): List of sentences to classify
+            batch_size (int): Optional cap on the number of sentences per batch
+            max_tokens (int): Token budget per batch (batch size x padded length)
+            
+        Returns:
+            list: List of numpy arrays, one probability vector per sentence
+        """
+        if not self.is_ready():
             # Fallback predictions
-            return [("Transforming", 0.5) for _ in sentences]
+            return [FALLBACK_PROBABILITIES for _ in sentences]
+        
+        results = [None] * len(sentences)
         
-        results = []
+        # Empty sentences are always "None" and skip the model; repeated sentences are scored once
+        pending = {}
+        for i, sentence in enumerate(sentences):
+            if str(sentence).strip():
+                pending.setdefault(hash_text(sentence), []).append(i)
+            else:
+                results[i] = EMPTY_SENTENCE_PROBABILITIES
         
+        # Serve what we can from the cache
+        if self.cache is not None and pending:
+            for key, cached in self.cache.get_many(list(pending)).items():
+                vector = np.array(cached, dtype=np.float32)
+                for i in pending.pop(key):
+                    results[i] = vector
+                self._count_tier('cache', 1)
+        
+        # Cascade: let the fast tier settle the sentences it is confident about
+        if self.cascade_threshold is not None and 'fast_tier' in self.models and pending:
+            keys = list(pending)
+            try:
+                fast = self._fast_tier_probabilities([str(sentences[pending[key][0]]).strip() for key in keys])
+            except Exception as e:
+                print(f"Fast tier prediction error: {e}")
+                fast = []
+            for key, vector in zip(keys, fast):
+                if vector.max() >= self.cascade_threshold:
+                    for i in pending.pop(key):
+                        results[i] = vector
+                    self._count_tier('fast', 1)
+        
+        if not pending:
+            return results
+        
+        keys = list(pending)
         try:
-            for i in range(0, len(sentences), batch_size):
-                batch = sentences[i:i+batch_size]
-                
-                # Tokenize batch
-                inputs = self.tokenizer(
-                    batch,
-                    return_tensors="pt",
-                    padding=True,
-                    truncation=True,
-                    max_length=512
-                )
+            computed = self._forward_probabilities(
+                [str(sentences[pending[key][0]]).strip() for key in keys],
+                batch_size,
+                max_tokens
+            )
+        except Exception as e:
+            print(f"SciBERT prediction error: {e}")
+            print(f"Device: {self.device}")
+            import traceback
+            traceback.print_exc()
+            # Fallback predictions
+            return [FALLBACK_PROBABILITIES for _ in sentences]
+        
+        for key, vector in zip(keys, computed):
+            for i in pending[key]:
+                results[i] = vector
+        self._count_tier('scibert', len(keys))
+        
+        if self.cache is not None:
+            self.cache.put_many({key: vector.tolist() for key, vector in zip(keys, computed)})
+        
+        return results
+    
+    def _forward_probabilities(self, sentences, batch_size=None, max_tokens=MAX_BATCH_TOKENS, model=None):
+        """
+        Run the model over non-empty sentences using length-sorted, token-budgeted batches.
+        
+        Args:
+            sentences (list): Stripped, non-empty sentences
+            batch_size (int): Optional cap on the number of sentences per batch
+            max_tokens (int): Token budget per batch (batch size x padded length)
+            model: PyTorch model to use instead of the active backend
+            
+        Returns:
+            list: List of numpy probability vectors in input order
+        """
+        results = [None] * len(sentences)
+        
+        # Tokenize everything once without padding; padding is added per batch
+        encodings = self.tokenizer(
+            sentences,
+            truncation=True,
+            max_length=512
+        )
+            
+        for batch in self._schedule_batches(encodings['input_ids'], max_tokens, batch_size):
+            features = [{key: encodings[key][j] for key in encodings.keys()} for j in batch]
+            
+            if model is None and self.onnx_session is not None:
+                inputs = self.tokenizer.pad(features, return_tensors="np")
+                logits = torch.from_numpy(self._run_onnx(inputs))
+            else:
+                inputs = self.tokenizer.pad(features, return_tensors="pt")
                 
                 # Move to device
                 inputs = {k: v.to(self.device) for k, v in inputs.items()}
                 
                 # Get predictions
                 with torch.no_grad():
-                    outputs = self.model(**inputs)
+                    outputs = (model or self.model)(**inputs)
                     logits = outputs.logits
-                    
-                    # Apply softmax to get probabilities
-                    probabilities = torch.softmax(logits, dim=-1)
-                    
-                    # Get predicted classes and confidences
-                    predicted_classes = torch.argmax(probabilities, dim=-1)
-                    confidences = torch.max(probabilities, dim=-1)[0]
-                
-                # Convert to results
-                for pred_class, confidence in zip(predicted_classes, confidences):
-                    predicted_move = RHETORICAL_MOVES.get(pred_class.item(), "Transforming")
-                    results.append((predicted_move, confidence.item()))
-        
-        except Exception as e:
-            print(f"Error in batch prediction: {e}")
-            # Fallback predictions
-            results = [("Transforming", 0.5) for _ in sentences]
+            
+            # Apply softmax to get probabilities (in fp32, whatever precision the model runs at)
+            probabilities = torch.softmax(logits.float(), dim=-1).cpu().numpy()
+            
+            # Scatter back to the original positions
+            for j, row in zip(batch, probabilities):
+                results[j] = row
         
         return results
     
+    def _run_onnx(self, inputs):
+        """Run one padded numpy batch through the ONNX Runtime session and return the logits."""
+        feed = {
+            graph_input.name: inputs[graph_input.name].astype(np.int64)
+            for graph_input in self.onnx_session.get_inputs()
+        }
+        return self.onnx_session.run(["logits"], feed)[0]
+    
+    @staticmethod
+    def _schedule_batches(input_ids, max_tokens, batch_size=None):
+        """
+        Group tokenized sentences into length-sorted batches under a token budget.
+        
+        Args:
+            input_ids (list): Token id lists, one per sentence
+            max_tokens (int): Maximum padded tokens (rows x longest row) per batch
+            batch_size (int): Optional cap on the number of rows per batch
+            
+        Returns:
+            list: Lists of positions into input_ids, one list per batch
+        """
+        order = sorted(range(len(input_ids)), key=lambda j: len(input_ids[j]))
+        
+        batches = []
+        current = []
+        for j in order:
+            # Sorted ascending, so the newest sentence sets the padded length
+            padded_length = len(input_ids[j])
+            too_many_tokens = (len(current) + 1) * padded_length > max_tokens
+            too_many_rows = batch_size is not None and len(current) >= batch_size
+            if current and (too_many_tokens or too_many_rows):
+                batches.append(current)
+                current = []
+            current.append(j)
+        if current:
+            batches.append(current)
+        
+        return batches
+    
     def get_model_info(self):
         """Get information about the loaded model."""
-        if self.model is None:
+        if not self.is_ready():
             return {
                 'model_type': 'None (Failed to load)',
                 'model_path': self.model_path,
@@ -233,10 +775,53 @@ class RhetoricalMoveClassifier:
         return {
             'model_type': 'SciBERT (allenai/scibert_scivocab_uncased)',
             'model_path': self.model_path,
-            'device': str(self.device),
+            'backend': self.backend,
+            'precision': self.precision,
+            'device': 'cpu' if self.backend == 'onnx' else str(self.device),
             'status': 'Loaded',
-            'num_labels': len(RHETORICAL_MOVES)
+            'num_labels': len(RHETORICAL_MOVES),
+            'cache': self.get_cache_stats(),
+            'cascade': self.get_cascade_stats(),
+            'memory': process_memory_info()
         }
+    
+    def get_cache_stats(self):
+        """Get hit/miss/eviction counters for the sentence prediction cache."""
+        if self.cache is None:
+            return None
+        return self.cache.get_stats()
+
+def process_memory_info():
+    """
+    Report how much of this process's memory is resident, shared and private.
+    
+    With weights shared across forked workers, "shared" grows and "private" stays small;
+    "pss" (proportional set size) is the fair per-worker share for sizing a fleet.
+    
+    Returns:
+        dict: Sizes in MB (Linux reads /proc/self/smaps_rollup; elsewhere only the peak RSS is known)
+    """
+    info = {'pid': os.getpid()}
+    try:
+        fields = {}
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1])
+        info.update({
+            'rss_mb': round(fields.get('Rss', 0) / 1024, 1),
+            'pss_mb': round(fields.get('Pss', 0) / 1024, 1),
+            'shared_mb': round((fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0)) / 1024, 1),
+            'private_mb': round((fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)) / 1024, 1)
+        })
+    except OSError:
+        import resource
+        import sys
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in kB elsewhere
+        info['max_rss_mb'] = round(max_rss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+    return info
 
 # For backward compatibility, also provide the old interface
 def predict_rhetorical_move(sentence):
@@ -247,9 +832,27 @@ def predict_rhetorical_move(sentence):
     return classifier.predict_rhetorical_move(sentence)
 
 if __name__ == "__main__":
-    # Test the classifier
-    classifier = RhetoricalMoveClassifier()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Test the SciBERT classifier or train its fast cascade tier")
+    parser.add_argument("--model-path", default="bert_comparison_results/scibert/final_model/")
+    parser.add_argument("--train-fast-tier", nargs="+", metavar="TEXT_FILE",
+                        help="Distill the fast TF-IDF tier from SciBERT's predictions on these text files")
+    args = parser.parse_args()
+    
+    classifier = RhetoricalMoveClassifier(args.model_path)
     
+    if args.train_fast_tier:
+        import nltk
+        
+        training_sentences = []
+        for text_file in args.train_fast_tier:
+            with open(text_file, 'r', encoding='utf-8') as f:
+                training_sentences.extend(nltk.sent_tokenize(f.read()))
+        print(f"Training fast tier on {len(training_sentences)} sentences")
+        print(classifier.train_fast_tier(training_sentences))
+    
+    # Test the classifier
     test_sentences = [
         "According to Smith (2019), climate change is a major concern.",
         "The researchers found significant correlations in their data.",
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Single-flight Request Coalescing
+
+When many identical requests arrive at once (a whole class pressing "Try Sample
+Text" together), only the first one for a given key does the work. The others
+wait for that computation and share its result instead of starting their own.
+Coalescing is per process; other workers on the machine find the result in the
+shared document cache once it is finished.
+"""
+
+import threading
+
+
+class FlightAbandoned(Exception):
+    """Raised to waiters when the computation they joined stopped without a result."""
+
+
+class _Flight:
+    """One in-progress computation and the callers waiting for it."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.abandoned = False
+        self.waiters = 0
+
+    def wait(self):
+        """
+        Wait for the computation to finish.
+
+        Returns:
+            The shared result
+
+        Raises:
+            FlightAbandoned: If the leader gave up without a result
+        """
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        if self.abandoned:
+            raise FlightAbandoned()
+        return self.result
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent computations of the same key into one.
+
+    do(key, fn) covers the common case. Callers that produce their result
+    incrementally (e.g. a streamed response) can use join() and then finish(),
+    fail() or abandon() themselves when they are the leader.
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+
+        self.stats = {
+            'computations': 0,
+            'coalesced': 0,
+            'failed': 0,
+            'abandoned': 0,
+            'max_waiters': 0
+        }
+
+    def join(self, key):
+        """
+        Join the computation of key, starting it if none is in progress.
+
+        Args:
+            key (str): Identifies the computation, e.g. a content hash
+
+        Returns:
+            tuple: (flight, is_leader). The leader must end the flight with finish(),
+                   fail() or abandon(); anyone else calls flight.wait()
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.waiters += 1
+                self.stats['coalesced'] += 1
+                self.stats['max_waiters'] = max(self.stats['max_waiters'], flight.waiters)
+                return flight, False
+            flight = _Flight()
+            self._flights[key] = flight
+            self.stats['computations'] += 1
+            return flight, True
+
+    def finish(self, key, flight, result):
+        """Publish the leader's result to everyone waiting on the flight."""
+        flight.result = result
+        self._land(key, flight)
+
+    def fail(self, key, flight, error):
+        """Pass the leader's exception on to everyone waiting on the flight."""
+        flight.error = error
+        with self._lock:
+            self.stats['failed'] += 1
+        self._land(key, flight)
+
+    def abandon(self, key, flight):
+        """End the flight without a result; waiters get FlightAbandoned and should compute it themselves."""
+        flight.abandoned = True
+        with self._lock:
+            self.stats['abandoned'] += 1
+        self._land(key, flight)
+
+    def _land(self, key, flight):
+        """Remove the flight, so later callers start afresh, and wake its waiters."""
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.done.set()
+
+    def do(self, key, fn):
+        """
+        Call fn(), unless a call for the same key is already running, then share its result.
+
+        Args:
+            key (str): Identifies the computation, e.g. a content hash
+            fn (callable): Computes the result; it must not modify it afterwards,
+                since every caller gets the same object
+
+        Returns:
+            The result of fn(), from this call or the one it joined
+        """
+        while True:
+            flight, leader = self.join(key)
+            if leader:
+                try:
+                    result = fn()
+                except BaseException as e:
+                    self.fail(key, flight, e)
+                    raise
+                self.finish(key, flight, result)
+                return result
+            try:
+                return flight.wait()
+            except FlightAbandoned:
+                # The leader's client went away; try again, becoming the leader if nobody else has
+                continue
+
+    def get_stats(self):
+        """Get counters for how many requests were computed and how many were coalesced."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['in_flight'] = len(self._flights)
+        requests = stats['computations'] + stats['coalesced']
+        stats['coalesced_rate'] = round(stats['coalesced'] / requests, 3) if requests else 0.0
+        return stats
@@ -0,0 +1,115 @@
+"""
+Streamed /analyze responses must carry the same analysis as the JSON response.
+
+The app is loaded without the SciBERT model, so moves come from the fixed fallback
+probabilities and the rule shortcuts; citation detection runs in full.
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import threading
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+# Keep every cache and queue of the app out of the repository
+_state_dir = tempfile.mkdtemp()
+os.environ['SCIBERT_MODEL_PATH'] = os.path.join(_state_dir, 'no_model')
+os.environ['PREDICTION_CACHE_PATH'] = ''
+os.environ['DOCUMENT_CACHE_PATH'] = ''
+os.environ['JOB_QUEUE_PATH'] = os.path.join(_state_dir, 'jobs.sqlite3')
+os.environ['JOB_UPLOAD_DIR'] = os.path.join(_state_dir, 'job_uploads')
+os.environ['ANALYSIS_STORE_PATH'] = os.path.join(_state_dir, 'analyses.sqlite3')
+os.environ['SEGMENTER_MODEL_PATH'] = os.path.join(_state_dir, 'academic_punkt.pickle')
+
+import app as analysis_app  # noqa: E402
+
+
+# "Johnson" is only cited after the first streamed window, but the possessive in the
+# first sentence still refers to that citation
+FILLER = "Revision is described here as a recursive process of rereading and rewriting. " * 40
+MULTI_WINDOW_TEXT = (
+    "Johnson's approach to feedback is widely used in writing classrooms.\n\n"
+    + FILLER + "\n\n"
+    + "Feedback shapes revision (Johnson, 2020). Smith (2019) disagrees with this view.\n\n"
+    + FILLER + "\n\n"
+    + "As noted by Smith, students rarely revise without prompting (Smith and Lee, 2021)."
+)
+
+
+@pytest.fixture
+def client():
+    analysis_app.document_cache.clear()
+    return analysis_app.app.test_client()
+
+
+def streamed_frames(client, text):
+    response = client.post('/analyze?stream=ndjson', json={'text': text})
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_streamed_sentences_match_json_response(client):
+    assert len(MULTI_WINDOW_TEXT) > 2 * analysis_app.STREAM_FIRST_WINDOW_CHARS
+    expected = client.post('/analyze', json={'text': MULTI_WINDOW_TEXT}).get_json()
+    first_sentence = expected['sentence_analysis'][0]
+    assert first_sentence['has_citation']
+
+    analysis_app.document_cache.clear()
+    frames = streamed_frames(client, MULTI_WINDOW_TEXT)
+    sentences = [frame['sentence'] for frame in frames if frame['type'] == 'sentence']
+    stats = frames[-1]
+
+    assert sentences == expected['sentence_analysis']
+    assert stats['type'] == 'stats'
+    assert stats['sentence_count'] == len(expected['sentence_analysis'])
+    assert stats['citation_count'] == expected['citation_count']
+    assert stats['rhetorical_move_stats'] == expected['rhetorical_move_stats']
+
+
+def test_streamed_result_in_cache_serves_json_requests(client):
+    expected = client.post('/analyze', json={'text': MULTI_WINDOW_TEXT})
+    etag = expected.headers['ETag']
+
+    # The stream leaves its result in the document cache for the JSON route
+    analysis_app.document_cache.clear()
+    streamed_frames(client, MULTI_WINDOW_TEXT)
+    cached = client.post('/analyze', json={'text': MULTI_WINDOW_TEXT})
+
+    assert cached.get_json() == expected.get_json()
+    assert cached.headers['ETag'] == etag
+    revalidated = client.post('/analyze', json={'text': MULTI_WINDOW_TEXT}, headers={'If-None-Match': etag})
+    assert revalidated.status_code == 304
+
+
+def test_concurrent_stream_and_json_requests_share_a_correct_analysis(client, monkeypatch):
+    expected = analysis_app.run_analysis(MULTI_WINDOW_TEXT)
+    coalesced = analysis_app.analysis_flight.get_stats()['coalesced']
+
+    # Slow the classifier down so the JSON request arrives while the stream is running
+    classify = analysis_app.analyze_rhetorical_moves_batch
+    def slow_classify(sentence_infos):
+        time.sleep(0.2)
+        return classify(sentence_infos)
+    monkeypatch.setattr(analysis_app, 'analyze_rhetorical_moves_batch', slow_classify)
+
+    streamed = []
+    stream_thread = threading.Thread(
+        target=lambda: streamed.extend(streamed_frames(analysis_app.app.test_client(), MULTI_WINDOW_TEXT)))
+    stream_thread.start()
+    deadline = time.time() + 10
+    while analysis_app.analysis_flight.get_stats()['in_flight'] == 0 and time.time() < deadline:
+        time.sleep(0.01)
+    answered = client.post('/analyze', json={'text': MULTI_WINDOW_TEXT}).get_json()
+    stream_thread.join(30)
+
+    assert analysis_app.analysis_flight.get_stats()['coalesced'] == coalesced + 1
+    assert answered['sentence_analysis'] == expected['sentence_analysis']
+    assert answered['rhetorical_move_stats'] == expected['rhetorical_move_stats']
+    assert [frame['sentence'] for frame in streamed if frame['type'] == 'sentence'] == expected['sentence_analysis']
+    assert streamed[-1]['citation_count'] == expected['citation_count']
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Single-pass Text Normalizer
+
+Cleans extracted essay text before segmentation: rejoins page ranges broken across
+lines, collapses whitespace while keeping paragraph breaks, drops the works cited
+section, rejoins words hyphenated across lines and tidies "( 2020 )" to "(2020)".
+
+All of the fixes run in one scan of the input with a single master regex, and the
+result keeps an offset map back to the original text, so a span found in the
+normalized text can be located in what the user uploaded.
+"""
+
+import re
+import bisect
+
+# A whitespace run that is not a paragraph break (a paragraph break contains a blank line)
+INLINE_SPACE = r'(?:[^\S\n]|\n(?!\n))+'
+
+# Everything from the first works cited heading onwards is dropped (common in essays).
+# The lookahead on the first letter lets the search skip most positions cheaply
+WORKS_CITED = re.compile(r'(?=[wrb])(?:works' + INLINE_SPACE + r'cited|references|bibliography)', re.IGNORECASE)
+
+# One alternative per fix, behind a lookahead on the characters they can start with
+NORMALIZER = re.compile(r'(?=[(\s-])(?:' + '|'.join([
+    # Citations whose page range is broken across lines, like "(Wilson, 2019, pp." then "78-92)"
+    r'(?P<broken_pages>\(\w+,\s+\d{4},\s+pp\.\s*\n\s*\d+[^\n]*?\))',
+    # Spaces inside a parenthesized year, like "Smith ( 2020 )"
+    r'(?P<spaced_year>\(' + INLINE_SPACE + r'(?P<year>\d{4})' + INLINE_SPACE + r'\))',
+    # Words hyphenated across lines, like "climate- related"
+    r'(?P<hyphen>-(?<=\w-)' + INLINE_SPACE + r'(?=\w))',
+    # Any other whitespace run except a lone space, which is already normalized
+    r'(?P<space>[^\S ]\s*| \s+)'
+]) + ')')
+
+WHITESPACE = re.compile(r'\s+')
+LEADING_SPACE = re.compile(r'\s*')
+
+
+class NormalizedText:
+    """
+    Normalized text together with its offset map back to the original.
+
+    The map is a list of segments; within a segment each normalized character maps
+    to the original character the same distance from the segment start.
+    """
+
+    def __init__(self, original, text, normalized_starts, original_starts):
+        self.original = original
+        self.text = text
+        self.normalized_starts = normalized_starts
+        self.original_starts = original_starts
+
+    def to_original(self, offset):
+        """
+        Map an offset in the normalized text to the original text.
+
+        Args:
+            offset (int): Character offset into the normalized text
+
+        Returns:
+            int: The matching character offset into the original text
+        """
+        index = bisect.bisect_right(self.normalized_starts, offset) - 1
+        if index < 0:
+            return offset
+        return self.original_starts[index] + offset - self.normalized_starts[index]
+
+    def span_to_original(self, start, end):
+        """
+        Map a (start, end) span in the normalized text to the original text.
+
+        The end is mapped through the last character of the span, so text removed
+        just after it (e.g. a trailing hyphen and line break) is not pulled in.
+
+        Args:
+            start (int): Start offset into the normalized text
+            end (int): End offset (exclusive) into the normalized text
+
+        Returns:
+            tuple: (start, end) offsets into the original text
+        """
+        original_start = self.to_original(start)
+        if end <= start:
+            return original_start, original_start
+        return original_start, self.to_original(end - 1) + 1
+
+
+def normalize_text(text):
+    """
+    Apply all cleanup fixes to text in a single pass.
+
+    Args:
+        text (str): Text as extracted from the uploaded file
+
+    Returns:
+        NormalizedText: The cleaned text and its offset map back to the input
+    """
+    # Only the text before the works cited section is scanned, without leading or trailing whitespace
+    works_cited = WORKS_CITED.search(text)
+    limit = works_cited.start() if works_cited else len(text)
+    begin = LEADING_SPACE.match(text, 0, limit).end()
+    while limit > begin and text[limit - 1].isspace():
+        limit -= 1
+
+    pieces = []
+    normalized_starts = []
+    original_starts = []
+    length = 0
+
+    def emit(piece, original_start):
+        # Append a piece of output that maps linearly onto the original from original_start
+        nonlocal length
+        if not piece:
+            return
+        # Extend the previous segment when the piece continues it
+        if not normalized_starts or original_start - length != original_starts[-1] - normalized_starts[-1]:
+            normalized_starts.append(length)
+            original_starts.append(original_start)
+        pieces.append(piece)
+        length += len(piece)
+
+    cursor = begin
+    for match in NORMALIZER.finditer(text, begin, limit):
+        start = match.start()
+        emit(text[cursor:start], cursor)
+        cursor = match.end()
+
+        kind = match.lastgroup
+        if kind == 'space':
+            # Paragraph breaks become one blank line, other runs one space
+            if '\n\n' in match.group():
+                emit('\n\n', start)
+            else:
+                emit(' ', start)
+        elif kind == 'broken_pages':
+            # Keep the citation, with every whitespace run inside it (including the line break) as one space
+            inner = start
+            for space in WHITESPACE.finditer(text, start, cursor):
+                emit(text[inner:space.start()], inner)
+                emit(' ', space.start())
+                inner = space.end()
+            emit(text[inner:cursor], inner)
+        elif kind == 'spaced_year':
+            emit('(', start)
+            emit(match.group('year'), match.start('year'))
+            emit(')', cursor - 1)
+        # A hyphen and line break between word halves is simply removed
+
+    emit(text[cursor:limit], cursor)
+
+    return NormalizedText(text, ''.join(pieces), normalized_starts, original_starts)